@@ -1,3 +1,9 @@
+import hashlib
+import mmap
+import os
+import struct
+
+
 class Variable():
 
     ACROSS = "across"
@@ -35,6 +41,198 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class WordIndex():
+
+    def __init__(self, words):
+        """
+        Index a vocabulary by word length and by the letter at each position.
+
+        Words of each length are numbered from 0, and sets of words of one
+        length are represented as bitsets: integers whose bit i is set when
+        word number i is in the set.
+        """
+        # Word lists and word -> number, for each length
+        self.words = dict()
+        self.ids = dict()
+        for word in sorted(words):
+            self.words.setdefault(len(word), []).append(word)
+        for length, bucket in self.words.items():
+            self.ids[length] = {word: i for i, word in enumerate(bucket)}
+
+        # self.masks[length][position][letter] is the bitset of words of
+        # that length with that letter at that position
+        self.masks = dict()
+        for length, bucket in self.words.items():
+            rows = [dict() for _ in range(length)]
+            size = (len(bucket) + 7) // 8
+            for i, word in enumerate(bucket):
+                byte, bit = i >> 3, 1 << (i & 7)
+                for position, letter in enumerate(word):
+                    if letter not in rows[position]:
+                        rows[position][letter] = bytearray(size)
+                    rows[position][letter][byte] |= bit
+            self.masks[length] = [
+                {
+                    letter: int.from_bytes(row, "little")
+                    for letter, row in letters.items()
+                }
+                for letters in rows
+            ]
+
+    # Cache file layout, all integers little-endian u32 ("<I"):
+    #   MAGIC, the 32-byte sha256 digest of the word list, number of lengths,
+    #   then for each length: the length, the size and bytes of its words
+    #   joined by newlines, and for each position the number of letters and,
+    #   per letter, its size and UTF-8 bytes followed by the size and bytes
+    #   of its mask (int.to_bytes).
+    MAGIC = b"WORDIDX1"
+
+    @classmethod
+    def load(cls, words_file, cache_file=None):
+        """
+        Return the index of the vocabulary in `words_file`.
+
+        The index is saved to `cache_file` (by default `words_file` + ".idx")
+        and reused on later runs, as long as the contents of `words_file`
+        have not changed since. If the cache cannot be written, the index
+        is still returned.
+        """
+        if cache_file is None:
+            cache_file = words_file + ".idx"
+        with open(words_file, "rb") as f:
+            contents = f.read()
+        digest = hashlib.sha256(contents).digest()
+
+        # Reuse the cache if it was built from the same contents
+        try:
+            with open(cache_file, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    index = cls.read_cache(data, digest)
+            if index is not None:
+                return index
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            pass
+
+        # Save vocabulary list uppercased, then index and cache it
+        index = cls(set(contents.decode().upper().splitlines()))
+        try:
+            temporary = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                index.write_cache(f, digest)
+            os.replace(temporary, cache_file)
+        except OSError:
+            pass
+        return index
+
+    def write_cache(self, f, digest):
+        """Write the index to binary file `f`, tagged with `digest`."""
+        f.write(WordIndex.MAGIC + digest)
+        f.write(struct.pack("<I", len(self.words)))
+        for length, bucket in self.words.items():
+            text = "\n".join(bucket).encode()
+            f.write(struct.pack("<II", length, len(text)) + text)
+            for letters in self.masks[length]:
+                f.write(struct.pack("<I", len(letters)))
+                for letter, mask in letters.items():
+                    name = letter.encode()
+                    bits = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+                    f.write(struct.pack("<I", len(name)) + name)
+                    f.write(struct.pack("<I", len(bits)) + bits)
+
+    @classmethod
+    def read_cache(cls, data, digest):
+        """
+        Return the index stored in buffer `data` (see write_cache), or None
+        if it was built from a different word list. Raises ValueError or
+        struct.error if `data` is not a complete cache.
+        """
+        header = len(WordIndex.MAGIC)
+        if data[:header] != WordIndex.MAGIC:
+            raise ValueError("not a word index cache")
+        if data[header:header + len(digest)] != digest:
+            return None
+        offset = header + len(digest)
+
+        def take(size):
+            nonlocal offset
+            if offset + size > len(data):
+                raise ValueError("truncated word index cache")
+            chunk = data[offset:offset + size]
+            offset += size
+            return chunk
+
+        def number():
+            return struct.unpack("<I", take(4))[0]
+
+        index = cls.__new__(cls)
+        index.words, index.ids, index.masks = dict(), dict(), dict()
+        for _ in range(number()):
+            length = number()
+            bucket = take(number()).decode().split("\n")
+            index.words[length] = bucket
+            index.ids[length] = {word: i for i, word in enumerate(bucket)}
+            rows = []
+            for _ in range(length):
+                letters = dict()
+                for _ in range(number()):
+                    letter = take(number()).decode()
+                    letters[letter] = int.from_bytes(take(number()), "little")
+                rows.append(letters)
+            index.masks[length] = rows
+        if offset != len(data):
+            raise ValueError("trailing data in word index cache")
+        return index
+
+    def vocabulary(self):
+        """Return the set of all indexed words."""
+        return set(
+            word for bucket in self.words.values() for word in bucket
+        )
+
+    def all(self, length):
+        """Return the bitset of every word of the given length."""
+        return (1 << len(self.words.get(length, []))) - 1
+
+    def encode(self, length, words):
+        """Return the bitset of the words in `words` of the given length."""
+        ids = self.ids.get(length, {})
+        bits = 0
+        for word in words:
+            if word in ids:
+                bits |= 1 << ids[word]
+        return bits
+
+    def decode(self, length, bits):
+        """Return the list of words of the given length in bitset `bits`."""
+        bucket = self.words.get(length, [])
+        return [
+            bucket[i] for i, bit in enumerate(reversed(bin(bits)[2:]))
+            if bit == "1"
+        ]
+
+    def letters(self, length, position):
+        """
+        Return a dict mapping each letter to the bitset of words of the given
+        length with that letter at `position`.
+        """
+        if length not in self.masks:
+            return {}
+        return self.masks[length][position]
+
+    def support(self, length, position, other_length, other_position, bits):
+        """
+        Return the bitset of words of `length` whose letter at `position`
+        is the letter at `other_position` of some word in `bits`, a bitset of
+        words of `other_length`.
+        """
+        masks = self.letters(length, position)
+        support = 0
+        for letter, mask in self.letters(other_length, other_position).items():
+            if mask & bits and letter in masks:
+                support |= masks[letter]
+        return support
+
+
 class Crossword():
 
     def __init__(self, structure_file, words_file):
@@ -58,8 +256,8 @@ class Crossword():
                 self.structure.append(row)
 
         # Save vocabulary list as self.words
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        self.index = WordIndex.load(words_file)
+        self.words = self.index.vocabulary()
 
         # Determine variable set
         self.variables = set()
@@ -125,9 +323,16 @@ class Crossword():
                         cells2.index(intersection)
                     )
 
+        # Overlapping variables of each variable, and every ordered pair of
+        # overlapping variables, computed once
+        self.adjacent = {var: set() for var in self.variables}
+        for (v1, v2), overlap in self.overlaps.items():
+            if overlap is not None:
+                self.adjacent[v1].add(v2)
+        self.arcs = [
+            (v1, v2) for v1 in self.variables for v2 in self.adjacent[v1]
+        ]
+
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.adjacent[var]
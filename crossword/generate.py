@@ -1,21 +1,110 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import random
 import sys
+import time
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from crossword import *
 
 
+def render(structure, letters, filename):
+    """
+    Draw a crossword to an image file, given its structure and letter grid.
+    A plain function, so that it can run in a worker process.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    height = len(structure)
+    width = len(structure[0]) if structure else 0
+    cell_size = 100
+    cell_border = 2
+    interior_size = cell_size - 2 * cell_border
+
+    # Create a blank canvas
+    img = Image.new(
+        "RGBA",
+        (width * cell_size,
+         height * cell_size),
+        "black"
+    )
+    font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
+    draw = ImageDraw.Draw(img)
+
+    for i in range(height):
+        for j in range(width):
+
+            rect = [
+                (j * cell_size + cell_border,
+                 i * cell_size + cell_border),
+                ((j + 1) * cell_size - cell_border,
+                 (i + 1) * cell_size - cell_border)
+            ]
+            if structure[i][j]:
+                draw.rectangle(rect, fill="white")
+                if letters[i][j]:
+                    w, h = draw.textsize(letters[i][j], font=font)
+                    draw.text(
+                        (rect[0][0] + ((interior_size - w) / 2),
+                         rect[0][1] + ((interior_size - h) / 2) - 10),
+                        letters[i][j], fill="black", font=font
+                    )
+
+    img.save(filename)
+
+
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, seed=None):
         """
         Create new CSP crossword generate.
+        With a `seed`, ties in variable and value ordering are broken at random.
         """
         self.crossword = crossword
-        # sets up domains for each variable var in self.crossword.variables(Notice it's not variables() as variables is not a fn, it's an object associated with/ it's property of the crossword object)
+        self.rng = None if seed is None else random.Random(seed)
+        self.index = crossword.index
+
+        # domains[var] is a bitset over the words of var's length (see WordIndex), so pruning a domain is a single integer operation
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.index.all(var.length)
             for var in self.crossword.variables
         }
 
+        # number of calls to revise made by ac3, for reporting
+        self.revisions = 0
+
+        # values tried by search, and the number after which search gives up (None for no limit). stopped is set when it gives up or times out.
+        self.nodes = 0
+        self.node_limit = None
+        self.stopped = False
+
+        # stack of (var, previous domain of var, previous culprits of var), pushed whenever a domain shrinks and popped by undo() when backtracking, so domains are never copied
+        self.trail = []
+
+        # conflict tracking for backjumping: culprits[var] is the set of assigned variables whose assignments pruned var's domain,
+        # and wiped is the variable whose domain was last emptied by inferences
+        self.culprits = {var: frozenset() for var in self.domains}
+        self.wiped = None
+
+        # learned nogoods: sets of (var, word) pairs that no solution contains, indexed by each of their pairs
+        self.nogoods = dict()
+
+        # heuristic bookkeeping, kept up to date as domains shrink and variables get (un)assigned rather than recomputed at every node:
+        # sizes[var] is the number of words left in var's domain, degrees[var] the number of unassigned neighbors of var
+        self.sizes = {var: domain.bit_count() for var, domain in self.domains.items()}
+        self.degrees = {var: len(self.crossword.neighbors(var)) for var in self.domains}
+        self.assigned = set()
+
+        # heap of (size, -degree, tiebreak, var) for MRV then degree. Entries go stale when size or degree changes and are skipped when popped.
+        self.heap = []
+        self.counter = itertools.count()
+        for var in self.domains:
+            self.push(var)
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -49,64 +138,119 @@ class CrosswordCreator():
         """
         Save crossword assignment to an image file.
         """
-        from PIL import Image, ImageDraw, ImageFont
-        cell_size = 100
-        cell_border = 2
-        interior_size = cell_size - 2 * cell_border
-        letters = self.letter_grid(assignment)
+        render(self.crossword.structure, self.letter_grid(assignment), filename)
 
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.crossword.width * cell_size,
-             self.crossword.height * cell_size),
-            "black"
+    def save_async(self, executor, assignment, filename):
+        """
+        Save crossword assignment to an image file in the background, using
+        `executor` (e.g. a concurrent.futures.ProcessPoolExecutor).
+        Return the Future of the rendering.
+        """
+        return executor.submit(
+            render, self.crossword.structure, self.letter_grid(assignment), filename
         )
-        font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
-        draw = ImageDraw.Draw(img)
-
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
-
-                rect = [
-                    (j * cell_size + cell_border,
-                     i * cell_size + cell_border),
-                    ((j + 1) * cell_size - cell_border,
-                     (i + 1) * cell_size - cell_border)
-                ]
-                if self.crossword.structure[i][j]:
-                    draw.rectangle(rect, fill="white")
-                    if letters[i][j]:
-                        w, h = draw.textsize(letters[i][j], font=font)
-                        draw.text(
-                            (rect[0][0] + ((interior_size - w) / 2),
-                             rect[0][1] + ((interior_size - h) / 2) - 10),
-                            letters[i][j], fill="black", font=font
-                        )
-
-        img.save(filename)
 
     def solve(self):
         """
         Enforce node and arc consistency, and then solve the CSP.
         """
         self.enforce_node_consistency()
-        self.ac3()
+        if not self.ac3():
+            return None  # some domain is empty, no search needed
         return self.backtrack(dict())
 
+    def solutions(self, limit=None, timeout=None):
+        """
+        Enforce node and arc consistency, and then lazily yield distinct
+        complete assignments, at most `limit` of them and for at most
+        `timeout` seconds. Each assignment yielded is a new dict.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.enforce_node_consistency()
+        if not self.ac3():
+            return
+        count = 0
+        for assignment in self.search(dict(), deadline):
+            yield assignment
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
     def enforce_node_consistency(self):
         """
         Update `self.domains` such that each variable is node-consistent.
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
+        # domains are bitsets over words of the variable's length only, so they start out node-consistent. Just drop anything beyond that.
         for var in self.crossword.variables:
-            length = var.length
-            for word in self.domains[var].copy():
-                if len(word) != length:
-                    self.domains[var].remove(word)
+            self.prune(var, self.domains[var] & self.index.all(var.length))
         # no need for any return value
 
+    def prune(self, var, domain, reason=frozenset()):
+        """
+        Replace the domain of `var` with the bitset `domain`, recording the
+        old domain on the trail so that `undo` can restore it. `reason` is
+        the set of assigned variables responsible for the pruning.
+
+        Return True if the domain changed.
+        """
+        if domain == self.domains[var]:
+            return False
+        self.trail.append((var, self.domains[var], self.culprits[var]))
+        self.domains[var] = domain
+        self.culprits[var] = self.culprits[var] | reason
+        self.sizes[var] = domain.bit_count()
+        self.push(var)
+        return True
+
+    def undo(self, mark):
+        """
+        Restore every domain pruned since the trail had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, domain, culprits = self.trail.pop()
+            self.domains[var] = domain
+            self.culprits[var] = culprits
+            self.sizes[var] = domain.bit_count()
+            self.push(var)
+
+    def push(self, var):
+        """
+        Add the current MRV/degree priority of `var` to the heap.
+        """
+        if var not in self.assigned:
+            tiebreak = next(self.counter) if self.rng is None else self.rng.random()
+            entry = (self.sizes[var], -self.degrees[var], tiebreak, var)
+            heapq.heappush(self.heap, entry)
+
+    def assign(self, assignment, var, word):
+        """
+        Assign `word` to `var`, updating the degrees of its neighbors.
+        """
+        assignment[var] = word
+        self.assigned.add(var)
+        for neighbor in self.crossword.neighbors(var):
+            self.degrees[neighbor] -= 1
+            self.push(neighbor)
+
+    def unassign(self, assignment, var):
+        """
+        Undo `assign` for `var`.
+        """
+        del assignment[var]
+        self.assigned.remove(var)
+        for neighbor in self.crossword.neighbors(var):
+            self.degrees[neighbor] += 1
+            self.push(neighbor)
+        self.push(var)
+
+    def words(self, var):
+        """
+        Return the list of words in the domain of `var`.
+        """
+        return self.index.decode(var.length, self.domains[var])
+
     def revise(self, x, y):
         """
         Make variable `x` arc consistent with variable `y`.
@@ -124,17 +268,10 @@ class CrosswordCreator():
             else:
                 a, b = self.crossword.overlaps[x, y]
 
-        Bool = False  # bool with lowercase b is a data type
-
-        # check which words can give a possible y. other words won't give a solution->remove from domain of x
-        for word in self.domains[x].copy():
-            common_letter = word[a]
-            if any((word2[b] == common_letter) for word2 in self.domains[y]):
-                continue
-            else:
-                Bool = True
-                self.domains[x].remove(word)
-        return Bool
+        # words of x whose letter at the overlap appears at the overlap in some word of y, found with the word index instead of comparing every pair of words
+        # whatever pruned y's domain is also why x lost these words
+        supported = self.index.support(x.length, a, y.length, b, self.domains[y])
+        return self.prune(x, self.domains[x] & supported, self.culprits[y])
 
     def ac3(self, arcs=None):
         """
@@ -145,24 +282,36 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
+        # only arcs between overlapping variables can ever revise a domain, so start with those (precomputed in Crossword) rather than every pair
         if arcs is None:
-            # equivalent to for x: for y: if x != y: append((x, y)), with the for's and if's written L to R in the same way as while nesting them
-            queue = [(x, y) for x in self.crossword.variables for y in self.crossword.variables if x != y]
-        else:
-            queue = arcs
-
-        for arc in queue:
-            x, y = list(arc)  # arc is a generator object, not exactly a tuple. convert it to tuple or list then use tuple assignment
+            arcs = self.crossword.arcs
+
+        # FIFO queue of arcs, plus the set of arcs currently in it so no arc is queued twice
+        queue = deque()
+        queued = set()
+        for arc in arcs:
+            if arc not in queued:
+                queued.add(arc)
+                queue.append(arc)
+
+        while queue:
+            arc = queue.popleft()
+            queued.remove(arc)
+            x, y = arc
+            self.revisions += 1
             if not self.revise(x, y):  # notice that ac3 is indirectly, via calling self.revise updating self.domains.
                 continue
 
             # domain of x is the one changing, if domain becomes empty, x can take no value->graph always arc-inconsistent->no solution
-            if len(self.domains[x]) == 0:
+            if self.domains[x] == 0:
+                self.wiped = x
                 return False  # no arc-consistent graph possible
 
-            # append neighbors of x to end of list to check them as well
+            # domain of x shrank, so neighbors of x may have lost support in x: queue arcs (z, x). y just supported x, so (y, x) is not needed.
             for z in self.crossword.neighbors(x):
-                queue.append((x, z))  # neighbors(x) is set of all vars st var ^ x != set().
+                if z != y and (z, x) not in queued:
+                    queued.add((z, x))
+                    queue.append((z, x))
 
         # made it to an empty queue -> now domains are arc-consistent -> return True
         return True
@@ -212,18 +361,29 @@ class CrosswordCreator():
         that rules out the fewest values among the neighbors of `var`.
         """
         # if word was the value of var, then how many total words are ruled out for var's neighbors? Call it p. then sort word in self.domains[var] in increasing order of p
+        # words of a neighbor that survive are those with the same letter at the overlap. Count them once per letter for each neighbor,
+        # then each word costs one lookup per neighbor
+        kept = []
+        for neighbor in self.crossword.neighbors(var):  # neighbor is a Variable intersecting var
+            if neighbor in assignment:
+                continue
+            a, b = self.crossword.overlaps[var, neighbor]
+            domain = self.domains[neighbor]
+            counts = {
+                letter: (domain & mask).bit_count()
+                for letter, mask in self.index.letters(neighbor.length, b).items()
+            }
+            kept.append((a, self.sizes[neighbor], counts))
+
         list_of_tuples = []
-        for word in self.domains[var]:
+        for word in self.words(var):
             count = 0
-            for neighbor in (self.crossword.neighbors(var) - set(assignment)):  # neighbor is a Variable intersecting var
-                a, b = self.crossword.overlaps[var, neighbor]
-                char = word[a]
-                for word2 in self.domains[neighbor]:
-                    if word2[b] != char:  # this particular word in neighbor is ruled out if word is the value of var
-                        count += 1
-            list_of_tuples.append((count, word))
+            for a, size, counts in kept:
+                count += size - counts.get(word[a], 0)  # this many words in neighbor are ruled out if word is the value of var
+            tiebreak = word if self.rng is None else self.rng.random()
+            list_of_tuples.append((count, tiebreak, word))
         sorted_list_of_tuples = sorted(list_of_tuples)  # sorted based on list[i][0] in inc order
-        return [elem[1] for elem in sorted_list_of_tuples]
+        return [elem[2] for elem in sorted_list_of_tuples]
 
     def select_unassigned_variable(self, assignment):
         """
@@ -233,43 +393,47 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        # given: an INcomplete assignment
-        list_of_unassigned_vars = set(self.domains) - set(assignment)
-        minLen = len(self.crossword.words)
-        best_vars = []
-        for var in list_of_unassigned_vars:
-            if len(self.domains[var]) < minLen:
-                minlen = len(self.domains[var])
-                best_vars = [var]
-            elif len(self.domains[var]) == minLen:
-                best_vars.append(var)
-
-        maxDeg = 0
-        for var in best_vars:
-            if len(self.crossword.neighbors(var)) >= maxDeg:
-                maxDeg = len(self.crossword.neighbors(var))
-                best_var = var
-        return var
-
-    def inferences(self, assignment):
-
-        domain_copy = self.domains.copy()
-        for var in assignment:
-            self.domains[var] = {assignment[var]}
-        other_vars = set(self.domains) - set(assignment)
-
-        # arcs to check for ac. No change in domain of vars in other_vars so the arcs between these vars are still consistent, no need to recheck those arcs.
-        arcs = [(x, y) for x in set(self.domains) for y in set(self.domains) if (x != y and (x in assignment or y in assignment))]
+        # given: an INcomplete assignment. The top of the heap is the answer once stale entries are dropped.
+        if len(self.heap) > 64 * len(self.domains):
+            # too many stale entries piled up: rebuild from the current sizes and degrees
+            self.heap = []
+            for var in set(self.domains) - set(assignment):
+                self.push(var)
+        while True:
+            size, degree, _, var = self.heap[0]
+            if (var not in assignment and size == self.sizes[var]
+                    and -degree == self.degrees[var]):
+                return var
+            heapq.heappop(self.heap)
+
+    def inferences(self, assignment, var):
+        """
+        Shrink the domain of `var` to its value in `assignment`, remove that
+        word from every other unassigned variable (words must be distinct),
+        and make the neighbors arc consistent again.
+
+        Domains are pruned through the trail, so the caller undoes all of
+        this on backtracking. Return False if some domain ends up empty,
+        with `self.wiped` set to its variable.
+        """
+        bit = 1 << self.index.ids[var.length][assignment[var]]
+        reason = frozenset([var])
+        self.prune(var, bit, reason)
+
+        # arcs to check for ac. Only vars whose domain just changed can make their neighbors lose support.
+        arcs = [(neighbor, var) for neighbor in self.crossword.neighbors(var)]
+        for other in self.crossword.variables:
+            if other == var or other.length != var.length:
+                continue
+            if self.domains[other] & bit:
+                self.prune(other, self.domains[other] & ~bit, reason)
+                if self.domains[other] == 0:
+                    self.wiped = other
+                    return False
+                arcs.extend((z, other) for z in self.crossword.neighbors(other))
 
         # now run ac3 with arcs.
-        if self.ac3():  # ie now all vars are arc-consistent
-            for var in other_vars:
-                if len(self.domains[var]) == 0:
-                    return None
-                if len(self.domains[var]) == 1:
-                    assignment.update({var: self.domains[var].pop()})
-        self.domains = domain_copy  # restore original self.domains (the assignment is just a guess, need not be true)
-        return assignment
+        return self.ac3(arcs)
 
     def backtrack(self, assignment):
         """
@@ -280,40 +444,193 @@ class CrosswordCreator():
 
         If no assignment is possible, return None.
         """
+        for result in self.search(assignment):
+            return result  # result is the complete assignment
+        # didn't return -> no solution with given assignment
+        return None
+
+    def learn(self, conflict, assignment):
+        """
+        Record that no solution assigns every variable in `conflict` its
+        value in `assignment`.
+        """
+        nogood = frozenset((var, assignment[var]) for var in conflict)
+        for pair in nogood:
+            self.nogoods.setdefault(pair, []).append(nogood)
+
+    def violated_nogood(self, assignment, var):
+        """
+        Return the variables of a learned nogood that the assignment of `var`
+        completes, or None if there is none.
+        """
+        for nogood in self.nogoods.get((var, assignment[var]), []):
+            if all(assignment.get(other) == word for other, word in nogood):
+                return frozenset(other for other, _ in nogood)
+        return None
+
+    def search(self, assignment, deadline=None):
+        """
+        Backtracking Search as a generator: yield a copy of every complete
+        assignment extending `assignment`, until time.monotonic() passes
+        `deadline` or `self.node_limit` values have been tried, in which case
+        `self.stopped` is set. Domains and `assignment` are restored when the
+        generator finishes or is closed.
+
+        Search backjumps: when no value of a variable works, the generator
+        returns the set of earlier variables that caused the failures (its
+        conflict set), learns their values as a nogood, and every variable
+        not in that set is skipped over on the way back. It returns None if
+        a solution was found below or the search was stopped.
+        """
         if self.assignment_complete(assignment):
-            return assignment
+            yield dict(assignment)
+            return None
 
         # choose a var. Then we try its values(if there is a solution, then some value for this var gives a complete consistent assignment
         var = self.select_unassigned_variable(assignment)
+
+        # values already pruned from var were pruned because of its culprits
+        conflict = self.culprits[var] - {var}
+        exhausted = True
         for val in self.order_domain_values(var, assignment):
-            assignment_new = assignment.copy()
-            assignment_new.update({var: val})
-            if self.inferences(assignment_new) is None:
-                continue  # this assignment_new doesn't work, try next val
+            if deadline is not None and time.monotonic() > deadline:
+                self.stopped = True
+                return None
+            if self.node_limit is not None and self.nodes >= self.node_limit:
+                self.stopped = True
+                return None
+            self.nodes += 1
+
+            # remember the trail, so every domain pruned for this val can be restored instead of copying the domains
+            mark = len(self.trail)
+            self.assign(assignment, var, val)
+            try:
+                culprits = self.violated_nogood(assignment, var)
+                if culprits is None:
+                    if self.inferences(assignment, var):
+                        culprits = yield from self.search(assignment, deadline)
+                    else:
+                        culprits = self.culprits[self.wiped]
+            finally:
+                self.unassign(assignment, var)
+                self.undo(mark)
+
+            if culprits is None:
+                exhausted = False  # a solution below, so no conflict to report
+            elif var not in culprits:
+                return culprits  # var played no part in the failure, so its other values fail too: jump back
             else:
-                assignment_new2 = self.inferences(assignment_new)
-            if self.consistent(assignment_new2):
-                result = self.backtrack(assignment_new2)
-                if result is not None:
-                    return result  # result is the complete assignment
-        # didn't return and finished checking all vals for var -> no solution with given assignment
-        return None
+                conflict |= culprits - {var}
+
+        # finished checking all vals for var -> no more solutions with given assignment
+        if not exhausted:
+            return None
+        self.learn(conflict, assignment)
+        return conflict
+
+
+def luby(i):
+    """
+    Return the i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+def portfolio_worker(crossword, seed, unit, results):
+    """
+    Search for a solution and put it (or None if there is none) on the
+    `results` queue. Without a seed, run one complete search. With a seed,
+    run randomised searches restarted after unit * luby(i) values.
+    """
+    restart = 1
+    while True:
+        creator = CrosswordCreator(crossword, seed=None if seed is None else f"{seed}.{restart}")
+        if seed is not None:
+            creator.node_limit = unit * luby(restart)
+        assignment = creator.solve()
+        if assignment is not None or not creator.stopped:
+            results.put(assignment)
+            return
+        restart += 1
+
+
+def portfolio(crossword, processes=None, unit=100):
+    """
+    Solve `crossword` with several differently ordered searches in separate
+    processes: one plain search plus randomised ones with Luby restarts.
+    Return the first answer found and stop the other processes.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=portfolio_worker,
+            args=(crossword, None if i == 0 else i, unit, results),
+            daemon=True
+        )
+        for i in range(max(processes, 1))
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        # a worker only reports None once it has proved there is no solution.
+        # poll, so that workers dying without an answer are noticed
+        while True:
+            try:
+                return results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            if not any(worker.is_alive() for worker in workers):
+                try:
+                    # an answer put just before its worker exited
+                    return results.get(timeout=0.1)
+                except queue.Empty:
+                    codes = [worker.exitcode for worker in workers]
+                    raise Exception(f"every portfolio worker exited without an answer (exit codes {codes})")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
 
 
 def main():
 
     # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+    if len(sys.argv) not in [3, 4, 5]:
+        sys.exit("Usage: python generate.py structure words [output] [count]")
 
     # Parse command-line arguments
     structure = sys.argv[1]
     words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    output = sys.argv[3] if len(sys.argv) >= 4 else None
+    count = int(sys.argv[4]) if len(sys.argv) == 5 else None
 
     # Generate crossword
     crossword = Crossword(structure, words)
     creator = CrosswordCreator(crossword)
+
+    # Generate a catalogue of `count` crosswords, saved as output0.png, output1.png, ... while the search goes on
+    if count is not None:
+        stem, ext = os.path.splitext(output or "output.png")
+        with ProcessPoolExecutor() as executor:
+            futures = []
+            for i, assignment in enumerate(creator.solutions(limit=count)):
+                creator.print(assignment)
+                print()
+                futures.append(creator.save_async(executor, assignment, f"{stem}{i}{ext}"))
+            for future in futures:
+                future.result()
+        if not futures:
+            print("No solution.")
+        return
+
     assignment = creator.solve()
 
     # Print result
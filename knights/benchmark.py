@@ -0,0 +1,128 @@
+import random
+import sys
+import time
+
+from logic import *
+from sat import Session, sat_check
+from truthtable import table_check
+
+
+def generate(speakers, depth=2, seed=0):
+    """
+    Generates a knights and knaves puzzle with `speakers` people, each making
+    one statement nested up to `depth` levels about who is a knight or knave.
+
+    Returns the knowledge base and the list of its symbols, encoded the same
+    way as in puzzle.py: everybody is exactly one of knight and knave, and a
+    person is a knight exactly when their statement is true. Its sentences
+    are interned, so repeated sub-statements are shared.
+    """
+    rng = random.Random(seed)
+    names = [f"P{i}" for i in range(speakers)]
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+
+    def statement(level):
+        """Returns a random statement about the speakers."""
+        if level == 0 or rng.random() < 0.3:
+            i = rng.randrange(speakers)
+            return rng.choice([knights[i], knaves[i]])
+        kind = rng.randrange(5)
+        if kind == 0:
+            return Not(statement(level - 1))
+        if kind == 1:
+            return And(statement(level - 1), statement(level - 1))
+        if kind == 2:
+            return Or(statement(level - 1), statement(level - 1))
+        if kind == 3:
+            return Implication(statement(level - 1), statement(level - 1))
+        return Biconditional(statement(level - 1), statement(level - 1))
+
+    knowledge = And()
+    for knight, knave in zip(knights, knaves):
+        knowledge.add(intern(Or(knight, knave)))
+        knowledge.add(intern(Or(Not(knight), Not(knave))))
+    for knight in knights:
+        knowledge.add(intern(Biconditional(knight, statement(depth))))
+
+    symbols = []
+    for knight, knave in zip(knights, knaves):
+        symbols.extend([knight, knave])
+    return knowledge, symbols
+
+
+def check_all(check, **options):
+    """
+    Returns an engine that asks `check` about one symbol at a time, passing
+    it `options` as keyword arguments.
+    """
+    def engine(knowledge, symbols, stats):
+        return [check(knowledge, symbol, stats=stats, **options)
+                for symbol in symbols]
+    return engine
+
+
+def session_engine(knowledge, symbols, stats):
+    session = Session(knowledge)
+    answers = [session.entails(symbol) for symbol in symbols]
+    stats["decisions"] = session.solver.decisions
+    stats["propagations"] = session.solver.propagations
+    return answers
+
+
+def engines(pool):
+    """
+    Returns a dict of engine name -> (function answering every symbol, most
+    symbols to try). Engines fill a stats dict with the work they did:
+    "models" visited by the model checkers, or "decisions" and
+    "propagations" made by the SAT solver. parallel_model_check runs every
+    query in `pool`, so starting processes is not part of its time.
+    """
+    return {
+        "model_check": (check_all(model_check), 20),
+        "parallel": (check_all(parallel_model_check, pool=pool), 16),
+        "table_check": (check_all(table_check), 26),
+        "sat_check": (check_all(sat_check), None),
+        "session": (session_engine, None),
+    }
+
+
+def main():
+
+    # Check usage
+    if len(sys.argv) > 4:
+        sys.exit("Usage: python benchmark.py [speakers] [depth] [seed]")
+    max_speakers = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    with model_check_pool() as pool:
+        print(f"{'speakers':>8} {'engine':>12} {'seconds':>10} {'visited':>10} {'per second':>11}  unit")
+        for speakers in range(1, max_speakers + 1):
+            knowledge, symbols = generate(speakers, depth, seed + speakers)
+
+            answers = dict()
+            for name, (engine, limit) in engines(pool).items():
+                if limit is not None and len(symbols) > limit:
+                    continue
+                stats = dict()
+                start = time.perf_counter()
+                answers[name] = engine(knowledge, symbols, stats)
+                seconds = time.perf_counter() - start
+
+                # Work actually done: models, or assignments made by the solver
+                if "models" in stats:
+                    visited, unit = stats["models"], "models"
+                else:
+                    visited = stats["decisions"] + stats["propagations"]
+                    unit = "assignments"
+                rate = visited / seconds if seconds else float("inf")
+                print(f"{speakers:>8} {name:>12} {seconds:>10.4f} {visited:>10} {rate:>11.3g}  {unit}")
+
+            # Every engine must agree, or one of them has regressed
+            if len(set(map(tuple, answers.values()))) > 1:
+                sys.exit(f"Engines disagree with {speakers} speakers: {answers}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,94 @@
 import itertools
+import multiprocessing
+import os
+import weakref
 
 
 class Sentence():
 
+    # Cached hash, symbol set and formula, computed on first use
+    _hash = None
+    _symbols = None
+    _formula = None
+
+    # True for sentences shared by intern, which must not change
+    frozen = False
+
+    # Weak references to the sentences this one is a part of, so that a
+    # change (And.add) can clear their caches too. Symbols never change, so
+    # they keep none.
+    _parents = ()
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave symbols
+        unassigned. Returns None if the value depends on those symbols.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_set())
+
+    def symbol_set(self):
+        """Returns a cached frozenset of all symbols in the sentence."""
+        if self._symbols is None:
+            self._symbols = frozenset().union(
+                *[child.symbol_set() for child in self.children()]
+            )
+        return self._symbols
+
+    def children(self):
+        """Returns a list of the immediate sub-sentences."""
+        return []
+
+    def forget(self):
+        """
+        Clears the cached hash, symbol set and formula of the sentence and of
+        every sentence containing it. A parent with nothing cached is not
+        followed further: its ancestors can only have cached values computed
+        through it.
+        """
+        changed = [self]
+        while changed:
+            sentence = changed.pop()
+            sentence._hash = None
+            sentence._symbols = None
+            sentence._formula = None
+            for parent in sentence._parents:
+                parent = parent()
+                if parent is not None and (parent._hash is not None
+                                           or parent._symbols is not None
+                                           or parent._formula is not None):
+                    changed.append(parent)
+
+    def adopt(self, children):
+        """Records the sentence as a parent of each of `children`."""
+        for child in children:
+            if not isinstance(child, Symbol):
+                if not child._parents:
+                    child._parents = []
+                child._parents.append(weakref.ref(self))
+
+    def __getstate__(self):
+        # caches are not sent to other processes, where hashes may differ,
+        # and parent links are weak references, rebuilt on unpickling
+        state = dict(self.__dict__)
+        for name in ("_hash", "_symbols", "_formula", "_parents"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.adopt(self.children())
 
     @classmethod
     def validate(cls, sentence):
@@ -48,10 +123,14 @@ class Symbol(Sentence):
         self.name = name
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name
+        )
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        if self._hash is None:
+            self._hash = hash(("symbol", self.name))
+        return self._hash
 
     def __repr__(self):
         return self.name
@@ -62,23 +141,34 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def symbol_set(self):
+        if self._symbols is None:
+            self._symbols = frozenset([self.name])
+        return self._symbols
 
 
 class Not(Sentence):
     def __init__(self, operand):
         Sentence.validate(operand)
         self.operand = operand
+        self.adopt([operand])
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand
+        )
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        if self._hash is None:
+            self._hash = hash(("not", hash(self.operand)))
+        return self._hash
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,11 +176,18 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
     def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+        if self._formula is None:
+            operand = Sentence.parenthesize(self.operand.formula())
+            self._formula = "¬" + operand
+        return self._formula
 
-    def symbols(self):
-        return self.operand.symbols()
+    def children(self):
+        return [self.operand]
 
 
 class And(Sentence):
@@ -98,14 +195,21 @@ class And(Sentence):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self.adopt(self.conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and self.conjuncts == other.conjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        # folded one conjunct at a time, so that add can extend it
+        if self._hash is None:
+            value = hash("and")
+            for conjunct in self.conjuncts:
+                value = hash((value, hash(conjunct)))
+            self._hash = value
+        return self._hash
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -115,19 +219,45 @@ class And(Sentence):
 
     def add(self, conjunct):
         Sentence.validate(conjunct)
+        if self.frozen:
+            raise Exception("cannot add to an interned sentence")
         self.conjuncts.append(conjunct)
+        self.adopt([conjunct])
+
+        # the hash and symbol set can be extended rather than rebuilt
+        value, symbols = self._hash, self._symbols
+        self.forget()
+        if value is not None:
+            self._hash = hash((value, hash(conjunct)))
+        if symbols is not None:
+            self._symbols = symbols | conjunct.symbol_set()
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
-        if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+        if self._formula is None:
+            if len(self.conjuncts) == 1:
+                self._formula = self.conjuncts[0].formula()
+            else:
+                self._formula = " ∧ ".join(
+                    [Sentence.parenthesize(conjunct.formula())
+                     for conjunct in self.conjuncts]
+                )
+        return self._formula
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def children(self):
+        return self.conjuncts
 
 
 class Or(Sentence):
@@ -135,14 +265,19 @@ class Or(Sentence):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
+        self.adopt(self.disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        if self._hash is None:
+            self._hash = hash(
+                ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+            )
+        return self._hash
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,14 +286,29 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
-        if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+        if self._formula is None:
+            if len(self.disjuncts) == 1:
+                self._formula = self.disjuncts[0].formula()
+            else:
+                self._formula = " ∨  ".join(
+                    [Sentence.parenthesize(disjunct.formula())
+                     for disjunct in self.disjuncts]
+                )
+        return self._formula
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def children(self):
+        return self.disjuncts
 
 
 class Implication(Sentence):
@@ -167,14 +317,19 @@ class Implication(Sentence):
         Sentence.validate(consequent)
         self.antecedent = antecedent
         self.consequent = consequent
+        self.adopt([antecedent, consequent])
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (isinstance(other, Implication)
+                                 and self.antecedent == other.antecedent
+                                 and self.consequent == other.consequent)
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        if self._hash is None:
+            self._hash = hash(
+                ("implies", hash(self.antecedent), hash(self.consequent))
+            )
+        return self._hash
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,13 +338,26 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+        if self._formula is None:
+            antecedent = Sentence.parenthesize(self.antecedent.formula())
+            consequent = Sentence.parenthesize(self.consequent.formula())
+            self._formula = f"{antecedent} => {consequent}"
+        return self._formula
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def children(self):
+        return [self.antecedent, self.consequent]
 
 
 class Biconditional(Sentence):
@@ -198,14 +366,19 @@ class Biconditional(Sentence):
         Sentence.validate(right)
         self.left = left
         self.right = right
+        self.adopt([left, right])
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (isinstance(other, Biconditional)
+                                 and self.left == other.left
+                                 and self.right == other.right)
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        if self._hash is None:
+            self._hash = hash(
+                ("biconditional", hash(self.left), hash(self.right))
+            )
+        return self._hash
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,48 +389,209 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
-    def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
-
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
 
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    def formula(self):
+        if self._formula is None:
+            left = Sentence.parenthesize(str(self.left))
+            right = Sentence.parenthesize(str(self.right))
+            self._formula = f"{left} <=> {right}"
+        return self._formula
+
+    def children(self):
+        return [self.left, self.right]
+
+
+# Interned sentences, keyed by type and the identities of their children
+_interned = weakref.WeakValueDictionary()
+
+
+def intern(sentence):
+    """
+    Returns the shared copy of `sentence`.
+
+    Structurally identical sub-sentences become the same object, so their
+    cached hash, symbol set and formula are computed once, and comparing
+    them is an identity check. Interned sentences are shared, so they are
+    frozen: `And.add` on one raises an exception (add to a new And of its
+    conjuncts instead).
+    """
+    Sentence.validate(sentence)
+    if isinstance(sentence, Symbol):
+        key = (Symbol, sentence.name)
+    else:
+        children = [intern(child) for child in sentence.children()]
+        key = (type(sentence), tuple(id(child) for child in children))
+    shared = _interned.get(key)
+    if shared is not None:
+        return shared
+
+    if isinstance(sentence, Symbol):
+        shared = Symbol(sentence.name)
+    else:
+        shared = type(sentence)(*children)
+    shared.frozen = True
+    _interned[key] = shared
+    return shared
+
+
+def gray_code_models(symbols, model=None):
+    """
+    Yields every assignment of `symbols`, in Gray code order.
+
+    The same `model` dict is yielded each time, with exactly one symbol
+    flipped from the previous assignment, so no dicts are copied. Symbols
+    start out false unless `model` already assigns them.
+    """
+    if model is None:
+        model = dict()
+    for symbol in symbols:
+        model.setdefault(symbol, False)
+    yield model
+    for i in range(1, 2 ** len(symbols)):
+
+        # Assignment i differs from i - 1 in the lowest set bit of i
+        symbol = symbols[(i & -i).bit_length() - 1]
+        model[symbol] = not model[symbol]
+        yield model
+
+
+def model_check(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query.
+    Adds the number of (partial) models visited to stats["models"].
+    """
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    symbols = list(set.union(knowledge.symbols(), query.symbols()))
+
+    # Depth-first search over partial models, without recursion: the first
+    # `depth` symbols are assigned, each tried true and then false
+    model = dict()
+    depth = 0
+    visited = 0
+    entailed = True
+    while True:
+        visited += 1
+
+        # A subtree can be skipped once the knowledge base is false in it,
+        # or once both the knowledge base and the query are true in it
+        kb = knowledge.evaluate_partial(model)
+        if kb is True:
+            q = query.evaluate_partial(model)
+            if q is False:
+                entailed = False
+                break
+            prune = q is True
+        else:
+            prune = kb is False
+
+        if not prune:
+            model[symbols[depth]] = True
+            depth += 1
+            continue
+
+        # Backtrack past symbols already tried both ways
+        while depth and not model[symbols[depth - 1]]:
+            depth -= 1
+            del model[symbols[depth]]
+        if not depth:
+            break
+        model[symbols[depth - 1]] = False
+
+    if stats is not None:
+        stats["models"] = stats.get("models", 0) + visited
+    return entailed
+
+
+# Number of the latest parallel_model_check query given up on, shared by
+# the workers of a pool from model_check_pool, and the parent's query counter
+_cancelled = None
+_queries = itertools.count()
+
+# Models checked between looks at whether the query was given up on
+CANCEL_CHECK = 4096
+
+
+def _init_worker(cancelled):
+    global _cancelled
+    _cancelled = cancelled
+
+
+def model_check_pool(processes=None):
+    """
+    Returns a process pool for parallel_model_check, which can be reused
+    across queries instead of starting new processes for each one.
+    """
+    cancelled = multiprocessing.Value("q", -1)
+    pool = multiprocessing.Pool(processes, _init_worker, (cancelled,))
+    pool.cancelled = cancelled
+    return pool
+
+
+def _check_prefix(task):
+    """
+    Checks entailment in every model whose first symbols take the values in
+    `prefix`, stopping as soon as a counter-model is found or the query is
+    given up on. Returns (entailed, number of models visited).
+    """
+    number, knowledge, query, symbols, prefix = task
+    if _cancelled.value >= number:
+        return True, 0
+    model = dict(zip(symbols, prefix))
+    visited = 0
+    for model in gray_code_models(symbols[len(prefix):], model):
+        visited += 1
+        if knowledge.evaluate(model) and not query.evaluate(model):
+            return False, visited
+        if visited % CANCEL_CHECK == 0 and _cancelled.value >= number:
+            break
+    return True, visited
+
+
+def parallel_model_check(knowledge, query, prefix_length=None,
+                         processes=None, stats=None, pool=None):
+    """
+    Checks if knowledge base entails query, like `model_check`.
+
+    The models are split into 2^prefix_length groups by the values of the
+    first symbols, and the groups are checked in `pool` (one made by
+    model_check_pool), or in a new pool of `processes` processes. Groups
+    still running when any group has a counter-model are given up on.
+    Adds the number of models the finished groups visited to stats["models"].
+    """
+    if pool is None:
+        with model_check_pool(processes) as pool:
+            return parallel_model_check(knowledge, query, prefix_length,
+                                        processes, stats, pool)
+
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if prefix_length is None:
+        # A few groups per process, so that uneven groups balance out
+        prefix_length = (processes - 1).bit_length() + 2
+    prefix_length = min(prefix_length, len(symbols))
+
+    number = next(_queries)
+    tasks = (
+        (number, knowledge, query, symbols, prefix)
+        for prefix in itertools.product((True, False), repeat=prefix_length)
+    )
+    visited = 0
+    entailed = True
+    for entailed, count in pool.imap_unordered(_check_prefix, tasks):
+        visited += count
+        if not entailed:
+            pool.cancelled.value = number
+            break
+    if stats is not None:
+        stats["models"] = stats.get("models", 0) + visited
+    return entailed
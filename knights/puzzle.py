@@ -1,4 +1,5 @@
 from logic import *
+from sat import Session
 
 AKnight = Symbol("A is a Knight")
 AKnave = Symbol("A is a Knave")
@@ -74,8 +75,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            session = Session(knowledge)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if session.entails(symbol):
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,380 @@
+from logic import *
+
+
+class CNF():
+    """
+    Conjunctive normal form of one or more logical sentences.
+
+    Sentences are converted with the Tseitin encoding: every compound
+    sub-sentence gets a fresh variable that is constrained to be equivalent
+    to it, so the number of clauses grows linearly with the size of the
+    sentence instead of exponentially. Literals are non-zero integers,
+    `v` for a variable and `-v` for its negation.
+    """
+
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses = []
+
+        # symbol name -> variable, and sub-sentence -> defining literal
+        self.variables = dict()
+        self.definitions = dict()
+        self.true = None
+
+    def new_var(self):
+        """Returns a fresh variable."""
+        self.num_vars += 1
+        return self.num_vars
+
+    def variable(self, name):
+        """Returns the variable of the symbol called `name`."""
+        if name not in self.variables:
+            self.variables[name] = self.new_var()
+        return self.variables[name]
+
+    def constant(self, value):
+        """Returns a literal that is always `value`."""
+        if self.true is None:
+            self.true = self.new_var()
+            self.clauses.append([self.true])
+        return self.true if value else -self.true
+
+    def add(self, sentence):
+        """Asserts that `sentence` is true."""
+        Sentence.validate(sentence)
+
+        # Top-level conjunctions need no definition of their own
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to `sentence`, defining it if new."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.definitions:
+            return self.definitions[sentence]
+
+        if isinstance(sentence, And):
+            lit = self._define_and(
+                [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            )
+        elif isinstance(sentence, Or):
+            lit = -self._define_and(
+                [-self.literal(disjunct) for disjunct in sentence.disjuncts]
+            )
+        elif isinstance(sentence, Implication):
+            lit = -self._define_and([self.literal(sentence.antecedent),
+                                     -self.literal(sentence.consequent)])
+        elif isinstance(sentence, Biconditional):
+            lit = self._define_iff(self.literal(sentence.left),
+                                   self.literal(sentence.right))
+        else:
+            raise TypeError(f"cannot convert {sentence!r} to CNF")
+
+        self.definitions[sentence] = lit
+        return lit
+
+    def _define_and(self, lits):
+        """Returns a literal `a` with a <=> (l1 ∧ l2 ∧ ... ∧ ln)."""
+        if not lits:
+            return self.constant(True)
+        if len(lits) == 1:
+            return lits[0]
+        a = self.new_var()
+        for lit in lits:
+            self.clauses.append([-a, lit])
+        self.clauses.append([a] + [-lit for lit in lits])
+        return a
+
+    def _define_iff(self, p, q):
+        """Returns a literal `a` with a <=> (p <=> q)."""
+        a = self.new_var()
+        self.clauses.append([-a, -p, q])
+        self.clauses.append([-a, p, -q])
+        self.clauses.append([a, p, q])
+        self.clauses.append([a, -p, -q])
+        return a
+
+
+class Solver():
+    """
+    DPLL satisfiability solver.
+
+    Unit propagation uses two watched literals per clause, so assigning a
+    variable only visits the clauses currently watching its negation, and
+    nothing has to be updated when backtracking.
+    """
+
+    def __init__(self, num_vars=0):
+        self.num_vars = 0
+        self.values = [None]
+        self.occurrences = [0]
+        self.watches = dict()
+        self.units = []
+        self.ok = True
+
+        self.trail = []
+        self.qhead = 0
+        self.model = None
+
+        # Search statistics, accumulated over all calls to solve
+        self.decisions = 0
+        self.propagations = 0
+
+        self.reserve(num_vars)
+
+    def reserve(self, num_vars):
+        """Makes room for variables 1 .. `num_vars`."""
+        while self.num_vars < num_vars:
+            self.num_vars += 1
+            self.values.append(None)
+            self.occurrences.append(0)
+            self.watches[self.num_vars] = []
+            self.watches[-self.num_vars] = []
+
+    def add_clause(self, clause):
+        """Adds a clause, given as an iterable of literals."""
+        lits = []
+        for lit in clause:
+            if -lit in lits:
+                return
+            if lit not in lits:
+                lits.append(lit)
+        if not lits:
+            self.ok = False
+            return
+
+        self.reserve(max(abs(lit) for lit in lits))
+        for lit in lits:
+            self.occurrences[abs(lit)] += 1
+        if len(lits) == 1:
+            self.units.append(lits[0])
+        else:
+            self.watches[lits[0]].append(lits)
+            self.watches[lits[1]].append(lits)
+
+    def add_cnf(self, cnf):
+        """Adds every clause of `cnf`."""
+        self.reserve(cnf.num_vars)
+        for clause in cnf.clauses:
+            self.add_clause(clause)
+
+    def simplify(self):
+        """
+        Propagates the unit clauses and keeps every implied literal as a
+        unit of its own, so later calls to solve start from them directly.
+        Returns False if the clauses are unsatisfiable.
+        """
+        if self.ok:
+            for lit in self.units:
+                if self.value(lit) is False:
+                    self.ok = False
+                elif self.value(lit) is None:
+                    self._assign(lit)
+            if self.ok and self._propagate() is not None:
+                self.ok = False
+            if self.ok:
+                self.units = list(self.trail)
+            self._undo(0)
+        return self.ok
+
+    def value(self, lit):
+        """Returns the truth value of `lit`, or None if unassigned."""
+        value = self.values[abs(lit)]
+        if value is None or lit > 0:
+            return value
+        return not value
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal in
+        `assumptions` true, in which case `self.model` maps each variable to
+        its value; returns False otherwise.
+        """
+        self.model = None
+        try:
+            return self._search(assumptions)
+        finally:
+            self._undo(0)
+
+    def _search(self, assumptions):
+        if not self.ok:
+            return False
+
+        # Units and assumptions hold at the root, so they are never undone
+        for lit in self.units + list(assumptions):
+            self.reserve(abs(lit))
+            value = self.value(lit)
+            if value is False:
+                return False
+            if value is None:
+                self._assign(lit)
+        if self._propagate() is not None:
+            return False
+
+        order = sorted(range(1, self.num_vars + 1),
+                       key=lambda var: -self.occurrences[var])
+
+        # Each decision is (trail position, literal, already flipped)
+        decisions = []
+        while True:
+            var = next((var for var in order if self.values[var] is None),
+                       None)
+            if var is None:
+                self.model = {
+                    var: self.values[var]
+                    for var in range(1, self.num_vars + 1)
+                }
+                return True
+
+            self.decisions += 1
+            decisions.append((len(self.trail), -var, False))
+            self._assign(-var)
+
+            # On conflict, flip the most recent decision not yet flipped
+            while self._propagate() is not None:
+                while True:
+                    if not decisions:
+                        return False
+                    position, lit, flipped = decisions.pop()
+                    self._undo(position)
+                    if not flipped:
+                        decisions.append((position, -lit, True))
+                        self._assign(-lit)
+                        break
+
+    def _assign(self, lit):
+        self.values[abs(lit)] = lit > 0
+        self.trail.append(lit)
+
+    def _undo(self, position):
+        """Unassigns every literal on the trail after `position`."""
+        for lit in self.trail[position:]:
+            self.values[abs(lit)] = None
+        del self.trail[position:]
+        self.qhead = min(self.qhead, position)
+
+    def _propagate(self):
+        """
+        Assigns every literal implied by unit clauses.
+        Returns a conflicting clause, or None if there is no conflict.
+        """
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            self.propagations += 1
+
+            watchers = self.watches[false_lit]
+            kept = []
+            for i, clause in enumerate(watchers):
+
+                # Keep the falsified watch in position 1
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                if self.value(first) is True:
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal that is not false to watch
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(first) is False:
+                        kept.extend(watchers[i + 1:])
+                        self.watches[false_lit] = kept
+                        return clause
+                    self._assign(first)
+            self.watches[false_lit] = kept
+        return None
+
+
+def sat_check(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query.
+
+    Drop-in alternative to `model_check`: the knowledge base entails the
+    query exactly when `knowledge ∧ ¬query` is unsatisfiable. Adds the
+    solver's decisions and propagations to stats["decisions"] and
+    stats["propagations"].
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.add(Not(query))
+
+    solver = Solver()
+    solver.add_cnf(cnf)
+    entailed = not solver.solve()
+    if stats is not None:
+        stats["decisions"] = stats.get("decisions", 0) + solver.decisions
+        stats["propagations"] = stats.get("propagations", 0) + solver.propagations
+    return entailed
+
+
+class Session():
+    """
+    Knowledge base loaded once into a solver, to ask many queries against.
+
+    Clauses are kept across queries, and each query is asked by solving
+    under the assumption that it is false. Every model found along the way
+    also refutes all other queries that are false in it, so those never
+    need a solve of their own.
+    """
+
+    def __init__(self, knowledge):
+        self.cnf = CNF()
+        self.cnf.add(knowledge)
+        self.solver = Solver()
+        self.solver.add_cnf(self.cnf)
+        self.loaded = len(self.cnf.clauses)
+
+        # Literals known to be false in some model of the knowledge base
+        self.refuted = set()
+        self.results = dict()
+
+        self.consistent = self.solver.simplify() and self.solver.solve()
+        if self.consistent:
+            self._learn(self.solver.model)
+
+    def _learn(self, model):
+        for var, value in model.items():
+            self.refuted.add(-var if value else var)
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        Sentence.validate(query)
+        if not self.consistent:
+            return True
+        if query in self.results:
+            return self.results[query]
+
+        lit = self.cnf.literal(query)
+        for clause in self.cnf.clauses[self.loaded:]:
+            self.solver.add_clause(clause)
+        self.loaded = len(self.cnf.clauses)
+
+        if lit in self.refuted:
+            entailed = False
+        elif self.solver.solve([-lit]):
+            self._learn(self.solver.model)
+            entailed = False
+        else:
+            entailed = True
+        self.results[query] = entailed
+        return entailed
+
+    def entailed_symbols(self):
+        """Returns the set of names of symbols the knowledge base entails."""
+        return set(
+            name for name in list(self.cnf.variables)
+            if self.entails(Symbol(name))
+        )
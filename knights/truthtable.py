@@ -0,0 +1,151 @@
+from logic import *
+
+# Assignments evaluated at once per block, as a power of two
+BLOCK_BITS = 16
+
+
+class Program():
+    """
+    Sentences compiled to a flat list of bitwise operations.
+
+    Each symbol is given a bit position, so assignment number m sets symbol
+    i to bit i of m. Running the program on a block of assignments computes
+    one packed truth-table column per sentence, with bit k of a column being
+    the sentence's value under assignment `start + k`. Python integers are
+    used as the packed columns, so every operation covers the whole block
+    at once. Shared sub-sentences are compiled only once.
+    """
+
+    def __init__(self, sentences, symbols=None):
+        if symbols is None:
+            symbols = set()
+            for sentence in sentences:
+                symbols |= sentence.symbols()
+        self.symbols = sorted(symbols)
+        self.positions = {name: i for i, name in enumerate(self.symbols)}
+
+        # Each instruction is (operation, operand registers)
+        self.instructions = []
+        self.registers = dict()
+        self.outputs = [self._compile(sentence) for sentence in sentences]
+
+    def _compile(self, sentence):
+        """Returns the register holding the value of `sentence`."""
+        if sentence in self.registers:
+            return self.registers[sentence]
+
+        if isinstance(sentence, Symbol):
+            if sentence.name not in self.positions:
+                raise Exception(f"variable {sentence.name} not in model")
+            instruction = ("symbol", self.positions[sentence.name])
+        elif isinstance(sentence, Not):
+            instruction = ("not", self._compile(sentence.operand))
+        elif isinstance(sentence, And):
+            instruction = ("and", *[self._compile(conjunct)
+                                    for conjunct in sentence.conjuncts])
+        elif isinstance(sentence, Or):
+            instruction = ("or", *[self._compile(disjunct)
+                                   for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            instruction = ("implies", self._compile(sentence.antecedent),
+                           self._compile(sentence.consequent))
+        elif isinstance(sentence, Biconditional):
+            instruction = ("biconditional", self._compile(sentence.left),
+                           self._compile(sentence.right))
+        else:
+            raise TypeError(f"cannot compile {sentence!r}")
+
+        self.instructions.append(instruction)
+        register = len(self.instructions) - 1
+        self.registers[sentence] = register
+        return register
+
+    def size(self):
+        """Returns the number of assignments to the symbols."""
+        return 1 << len(self.symbols)
+
+    def block_bits(self):
+        """Returns log2 of the number of assignments run per block."""
+        return min(BLOCK_BITS, len(self.symbols))
+
+    def patterns(self, bits):
+        """
+        Returns the columns of the first `bits` symbols over a block of
+        2^bits assignments: symbol i is true in the upper half of every
+        run of 2^(i + 1) assignments.
+        """
+        width = 1 << bits
+        ones = (1 << width) - 1
+        patterns = []
+        for i in range(bits):
+            run = 1 << (i + 1)
+            half = ((1 << (run >> 1)) - 1) << (run >> 1)
+            patterns.append(half * (ones // ((1 << run) - 1)))
+        return patterns
+
+    def run(self, start, bits, patterns=None):
+        """
+        Evaluates every output over assignments start .. start + 2^bits - 1,
+        where `start` is a multiple of 2^bits. Returns the output columns.
+        """
+        if patterns is None:
+            patterns = self.patterns(bits)
+        ones = (1 << (1 << bits)) - 1
+
+        values = []
+        for operation, *operands in self.instructions:
+            if operation == "symbol":
+                i = operands[0]
+                if i < bits:
+                    value = patterns[i]
+                else:
+                    value = ones if (start >> i) & 1 else 0
+            elif operation == "not":
+                value = ones ^ values[operands[0]]
+            elif operation == "and":
+                value = ones
+                for operand in operands:
+                    value &= values[operand]
+            elif operation == "or":
+                value = 0
+                for operand in operands:
+                    value |= values[operand]
+            elif operation == "implies":
+                value = (ones ^ values[operands[0]]) | values[operands[1]]
+            else:
+                value = ones ^ values[operands[0]] ^ values[operands[1]]
+            values.append(value)
+        return [values[output] for output in self.outputs]
+
+    def model(self, index):
+        """Returns the model given by assignment number `index`."""
+        return {
+            name: bool((index >> i) & 1)
+            for i, name in enumerate(self.symbols)
+        }
+
+
+def table_check(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query.
+
+    Drop-in alternative to `model_check` that compiles both sentences once
+    and evaluates them over whole blocks of models with bitwise operations.
+    Adds the number of models evaluated to stats["models"].
+    """
+    program = Program([knowledge, query])
+    bits = program.block_bits()
+    patterns = program.patterns(bits)
+    entailed = True
+    visited = 0
+    for start in range(0, program.size(), 1 << bits):
+        kb, q = program.run(start, bits, patterns)
+        visited += min(1 << bits, program.size() - start)
+
+        # Any model of the knowledge base where the query is false
+        if kb & ~q:
+            entailed = False
+            break
+    if stats is not None:
+        stats["models"] = stats.get("models", 0) + visited
+    return entailed
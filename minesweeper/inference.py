@@ -0,0 +1,304 @@
+"""
+Inference over Minesweeper sentences, one frontier component at a time
+
+Sentences only interact through the cells they share, so the knowledge
+base splits into independent components. Each component is a small
+system of linear equations over 0/1 variables (one per cell, 1 = mine):
+integer Gaussian elimination reads off the easy conclusions, and a
+bounded enumeration of the component's mine configurations finds the rest.
+The same enumerations, weighted by how many ways the remaining mines fit
+in the unconstrained cells, give each cell's probability of being a mine.
+"""
+
+from math import comb, gcd
+
+# Most search nodes spent enumerating one component before giving up
+NODE_LIMIT = 20000
+
+
+def components(sentences):
+    """
+    Splits sentences (with non-empty cells) into lists of sentences
+    that are connected by shared cells.
+    """
+    parent = dict()
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    for sentence in sentences:
+        cells = iter(sentence.cells)
+        first = next(cells, None)
+        if first is None:
+            continue
+        parent.setdefault(first, first)
+        root = find(first)
+        for cell in cells:
+            parent.setdefault(cell, cell)
+            other = find(cell)
+            if other != root:
+                parent[other] = root
+
+    groups = dict()
+    for sentence in sentences:
+        if sentence.cells:
+            groups.setdefault(find(next(iter(sentence.cells))), []).append(sentence)
+    return list(groups.values())
+
+
+def eliminate(sentences):
+    """
+    Returns (safes, mines) deduced by integer Gaussian elimination on the
+    equations `sum of cells = count`.
+
+    Every row of the reduced system reads sum(a * x) = b. With x in {0, 1},
+    the left side lies between the sum of the negative coefficients and the
+    sum of the positive ones; if b equals either bound, every cell in the
+    row is fixed.
+    """
+    cells = sorted(set().union(*(sentence.cells for sentence in sentences)))
+    column = {cell: k for k, cell in enumerate(cells)}
+    rows = []
+    for sentence in sentences:
+        row = [0] * (len(cells) + 1)
+        for cell in sentence.cells:
+            row[column[cell]] = 1
+        row[-1] = sentence.count
+        rows.append(row)
+
+    # fraction-free reduction: rows stay integer, divided by their gcd
+    pivot_row = 0
+    for k in range(len(cells)):
+        pivot = next((r for r in range(pivot_row, len(rows)) if rows[r][k]), None)
+        if pivot is None:
+            continue
+        rows[pivot_row], rows[pivot] = rows[pivot], rows[pivot_row]
+        top = rows[pivot_row]
+        for r in range(len(rows)):
+            factor = rows[r][k]
+            if r == pivot_row or not factor:
+                continue
+            row = [top[k] * a - factor * b for a, b in zip(rows[r], top)]
+            divisor = 0
+            for a in row:
+                divisor = gcd(divisor, a)
+            rows[r] = [a // divisor for a in row] if divisor > 1 else row
+        pivot_row += 1
+        if pivot_row == len(rows):
+            break
+
+    safes, mines = set(), set()
+    for row in rows:
+        *coefficients, total = row
+        low = sum(a for a in coefficients if a < 0)
+        high = sum(a for a in coefficients if a > 0)
+        if total == low or total == high:
+            for cell, a in zip(cells, coefficients):
+                if a and (a > 0) == (total == high):
+                    mines.add(cell)
+                elif a:
+                    safes.add(cell)
+    return safes, mines
+
+
+def enumerate_configurations(sentences, node_limit=NODE_LIMIT):
+    """
+    Enumerates the mine configurations satisfying every sentence of one
+    component.
+
+    Returns (cells, counts): counts maps a number of mines m to
+    (configurations with m mines, list of how many of those have a mine
+    in each of cells). Returns None if it takes more than node_limit nodes.
+    """
+    # order cells breadth-first through the sentences, so each sentence is
+    # completed (and checked) soon after its first cell is assigned
+    containing = dict()
+    for s, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            containing.setdefault(cell, []).append(s)
+    cells = []
+    position = dict()
+    queue = [min(range(len(sentences)), key=lambda s: len(sentences[s].cells))]
+    queued = set(queue)
+    for s in queue:
+        for cell in sorted(sentences[s].cells):
+            if cell not in position:
+                position[cell] = len(cells)
+                cells.append(cell)
+                for t in containing[cell]:
+                    if t not in queued:
+                        queued.add(t)
+                        queue.append(t)
+
+    # per sentence: mines still to place, and cells still unassigned
+    need = [sentence.count for sentence in sentences]
+    free = [len(sentence.cells) for sentence in sentences]
+    touching = [[] for _ in cells]
+    for s, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            touching[position[cell]].append(s)
+
+    counts = dict()
+    assignment = [0] * len(cells)
+    nodes = 0
+
+    def search(k, placed):
+        nonlocal nodes
+        nodes += 1
+        if nodes > node_limit:
+            return False
+        if k == len(cells):
+            total, per_cell = counts.setdefault(placed, (0, [0] * len(cells)))
+            for i, mine in enumerate(assignment):
+                per_cell[i] += mine
+            counts[placed] = (total + 1, per_cell)
+            return True
+        for mine in (0, 1):
+            # sentence s stays satisfiable if 0 <= need <= free after the move
+            if all(0 <= need[s] - mine <= free[s] - 1 for s in touching[k]):
+                for s in touching[k]:
+                    need[s] -= mine
+                    free[s] -= 1
+                assignment[k] = mine
+                finished = search(k + 1, placed + mine)
+                for s in touching[k]:
+                    need[s] += mine
+                    free[s] += 1
+                if not finished:
+                    return False
+        assignment[k] = 0
+        return True
+
+    if not search(0, 0):
+        return None
+    return cells, counts
+
+
+def signature(sentences):
+    """Returns a hashable key for a component, independent of sentence order."""
+    return frozenset((frozenset(sentence.cells), sentence.count) for sentence in sentences)
+
+
+def configurations(sentences, cache=None, node_limit=NODE_LIMIT):
+    """
+    enumerate_configurations, remembered in `cache` (a dict) by component.
+    """
+    if cache is None:
+        return enumerate_configurations(sentences, node_limit)
+    component = signature(sentences)
+    if component not in cache:
+        cache[component] = enumerate_configurations(sentences, node_limit)
+    return cache[component]
+
+
+def solve(sentences, cache=None, node_limit=NODE_LIMIT):
+    """
+    Returns (safes, mines) that follow from the sentences of one component.
+    """
+    safes, mines = eliminate(sentences)
+    if safes or mines:
+        return safes, mines
+
+    enumerated = configurations(sentences, cache, node_limit)
+    if enumerated is None:
+        return safes, mines
+    cells, counts = enumerated
+    if not counts:
+        return safes, mines  # contradictory sentences
+    found = sum(total for total, _ in counts.values())
+    for i, cell in enumerate(cells):
+        times = sum(per_cell[i] for _, per_cell in counts.values())
+        if times == 0:
+            safes.add(cell)
+        elif times == found:
+            mines.add(cell)
+    return safes, mines
+
+
+def ways(cells, mines):
+    """Number of ways to place `mines` mines in `cells` cells."""
+    if mines < 0 or mines > cells:
+        return 0
+    return comb(cells, mines)
+
+
+def convolve(first, second):
+    """Combines two lists of counts indexed by number of mines."""
+    combined = [0] * (len(first) + len(second) - 1)
+    for i, a in enumerate(first):
+        if a:
+            for j, b in enumerate(second):
+                combined[i + j] += a * b
+    return combined
+
+
+def probabilities(components, unconstrained, mines_left, cache=None, node_limit=NODE_LIMIT):
+    """
+    Returns (risk, other): risk maps every cell of the components to its
+    probability of being a mine, and other is the probability for each of
+    the `unconstrained` unknown cells outside them, given that `mines_left`
+    mines remain among all unknown cells.
+
+    Every configuration of the components leaves some number s of mines
+    for the unconstrained cells, which can hold them in C(unconstrained, s)
+    ways, so configurations are weighted by that count. Components too
+    large to enumerate fall back to each sentence's own mine density.
+    Returns None if the sentences and mines_left are inconsistent.
+    """
+    risk = dict()
+    solved = []
+    for component in components:
+        enumerated = configurations(component, cache, node_limit)
+        if enumerated is not None and enumerated[1]:
+            solved.append(enumerated)
+            continue
+
+        # estimate each cell by the densest sentence it is in, and take
+        # the expected number of mines out of the pool
+        for sentence in component:
+            density = sentence.count / len(sentence.cells)
+            for cell in sentence.cells:
+                risk[cell] = max(risk.get(cell, 0), density)
+        mines_left -= round(sum(risk[cell] for cell in set().union(*(s.cells for s in component))))
+
+    # number of configurations of each component, by number of mines
+    totals = []
+    for cells, counts in solved:
+        total = [0] * (max(counts) + 1)
+        for mines, (found, _) in counts.items():
+            total[mines] = found
+        totals.append(total)
+
+    # prefix[c] combines components before c, suffix[c] those from c on
+    prefix = [[1]]
+    for total in totals:
+        prefix.append(convolve(prefix[-1], total))
+    suffix = [[1]]
+    for total in reversed(totals):
+        suffix.append(convolve(total, suffix[-1]))
+    suffix.reverse()
+
+    # weight of all configurations, and of mines left to unconstrained cells
+    weight = 0
+    outside = 0
+    for placed, count in enumerate(prefix[-1]):
+        fits = count * ways(unconstrained, mines_left - placed)
+        weight += fits
+        outside += fits * (mines_left - placed)
+    if weight == 0:
+        return None
+
+    for c, (cells, counts) in enumerate(solved):
+        others = convolve(prefix[c], suffix[c + 1])
+        for mines, (_, per_cell) in counts.items():
+            # weight of the rest of the board when this component has `mines` mines
+            rest = sum(count * ways(unconstrained, mines_left - mines - placed)
+                       for placed, count in enumerate(others))
+            for cell, times in zip(cells, per_cell):
+                risk[cell] = risk.get(cell, 0) + times * rest / weight
+
+    other = outside / weight / unconstrained if unconstrained else 1
+    return risk, other
@@ -1,6 +1,9 @@
 import itertools
 import random
 import copy
+from collections import deque
+
+from inference import components, probabilities, signature, solve
 
 
 class Minesweeper():
@@ -99,6 +102,9 @@ class Sentence():
         self.cells = set(cells)
         self.count = count
 
+        # True until the sentence's component has been solved since it last changed
+        self.dirty = True
+
     # check equality of two sentences
     def __eq__(self, other):
 
@@ -161,11 +167,12 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=8):
 
-        # Set initial height and width
+        # Set initial height and width, and the number of mines on the board
         self.height = height
         self.width = width
+        self.mine_count = mines
 
         # Keep track of which cells have been clicked on
         self.moves_made = set()
@@ -177,23 +184,64 @@ class MinesweeperAI():
         # (List of sentences) about the game known to be true
         self.knowledge = []
 
+        # mine configurations of each component of the knowledge, see inference.py
+        self.cache = dict()
+
+        # cell -> sentences containing it, for cells not yet known
+        self.containing = dict()
+
+        # newly known (cell, is mine) pairs not yet applied to the sentences
+        self.queue = deque()
+        self.propagating = False
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates self.knowledge and self.mines
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        if cell not in self.mines:
+            self.mines.add(cell)
+            self.queue.append((cell, True))
+            self.propagate()
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates self.knowledge and self.safes
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if cell not in self.safes:
+            self.safes.add(cell)
+            self.queue.append((cell, False))
+            self.propagate()
+
+    def propagate(self):
+        """
+        Applies every queued safe or mine to the sentences containing it,
+        queueing in turn whatever those sentences then give away.
+        Each cell is applied once, and only to its own sentences.
+        """
+        if self.propagating:
+            return  # marks made while propagating join the queue being emptied
+        self.propagating = True
+        while self.queue:
+            cell, mine = self.queue.popleft()
+            for sentence in self.containing.pop(cell, []):
+                if mine:
+                    sentence.mark_mine(cell)
+                else:
+                    sentence.mark_safe(cell)
+                sentence.dirty = True
+                self.conclude(sentence)
+        self.propagating = False
+
+    def conclude(self, sentence):
+        """
+        Marks the cells of sentence if they are all safe or all mines.
+        """
+        for mine in sentence.known_mines():
+            self.mark_mine(mine)
+        for safe in sentence.known_safes():
+            self.mark_safe(safe)
 
     # called in runner.py, line 214. given the cell and #mines in neighbors
     def add_knowledge(self, cell, count):
@@ -226,58 +274,52 @@ class MinesweeperAI():
                 if 0 <= i < self.height and 0 <= j < self.width:
                     neighbor_cells.add((i, j))
 
-        self.knowledge.append(Sentence(neighbor_cells, count))
+        # leave out cells already known, so sentences only hold unknown cells
+        for neighbor in list(neighbor_cells):
+            if neighbor in self.mines:
+                neighbor_cells.remove(neighbor)
+                count -= 1
+            elif neighbor in self.safes:
+                neighbor_cells.remove(neighbor)
+
+        sentence = Sentence(neighbor_cells, count)
+        self.knowledge.append(sentence)
+        for neighbor in neighbor_cells:
+            self.containing.setdefault(neighbor, []).append(sentence)
+        self.conclude(sentence)
 
         while True:
-            knowledge = copy.deepcopy(self.knowledge)  # some sentences in knowledge got modified with shallow copy
-
-            # get new sentences from old sentences and new added one as no old is a subset of an old
-            for sentence1 in knowledge:
-                for sentence2 in knowledge:
-                    if (not sentence1.cells == sentence2.cells
-                            and sentence1.cells.issubset(sentence2.cells) and sentence1.cells != set()):
-                        new_cells = sentence2.cells - sentence1.cells
-                        # don't use var = count here as count is already a var
-                        new_count = sentence2.count - sentence1.count
-                        new_sentence = Sentence(new_cells, new_count)
-                        self.knowledge.append(new_sentence)
-                        if sentence2 in self.knowledge:
-                            self.knowledge.remove(sentence2)
-
-            # add info
-            for sentence in self.knowledge:
-
-                # collect obvious information ie known_mines and known_safes
-                for mine in sentence.known_mines():
-
-                    # add to mines, update self.knowledge's sentences as well
-                    self.mines.add(mine)  # NOT self.mark_mine, we don't want to sum over all sentences.
-                    sentence.mark_mine(mine)
-
-                for safe in sentence.known_safes():
-                    self.safes.add(safe)
-                    sentence.mark_safe(safe)
-
-                # we are mutating the sentences here, so self.knowledge is required in the first loop and not a copy.
-                # the size of self.knowledge is same though
-                if not sentence.cells == set():  # just for speed
-                    for cell in self.safes:
-                        sentence.mark_safe(cell)
-                    for cell in self.mines:
-                        sentence.mark_mine(cell)
-                    # loop for self.moves_made not required as moves_made is a subset of safes
-
-            null_sentence = Sentence(set(), 0)
-            while null_sentence in self.knowledge:
-                self.knowledge.remove(null_sentence)
-
-            if knowledge == self.knowledge:
-                # so now they are equal objects ie nothing happened from start of the while loop ie no new knowledge
-                # null_sentences could still be there, so cleanup, then finish
-                null_sentence = Sentence(set(), 0)
-                while null_sentence in self.knowledge:
-                    self.knowledge.remove(null_sentence)
-                return
+            self.knowledge = [sentence for sentence in self.knowledge if sentence.cells]
+
+            # solve each independent group of sentences, instead of comparing every pair of sentences.
+            # groups where nothing changed since they were last solved have nothing new to give
+            learnt = False
+            groups = components(self.knowledge)
+            for component in groups:
+                if not any(sentence.dirty for sentence in component):
+                    continue
+                for sentence in component:
+                    sentence.dirty = False
+                safes, mines = solve(component, self.cache)
+                for mine in mines:
+                    self.mark_mine(mine)
+                for safe in safes:
+                    self.mark_safe(safe)
+                learnt = learnt or bool(safes or mines)
+            if not learnt:
+                break
+
+        # drop duplicate sentences, and keep only the enumerations of the components that are left
+        seen = set()
+        knowledge = []
+        for sentence in self.knowledge:
+            key = (frozenset(sentence.cells), sentence.count)
+            if key not in seen:
+                seen.add(key)
+                knowledge.append(sentence)
+        self.knowledge = knowledge
+        current = {signature(component) for component in groups}
+        self.cache = {k: v for k, v in self.cache.items() if k in current}
 
     def make_safe_move(self):
         """
@@ -303,9 +345,10 @@ class MinesweeperAI():
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        the one least likely to be a mine (randomly among equally likely ones).
         """
         # note that this fn is only called when self.safes is a subset of self.moves_made, so it chooses a 'new' cell
         sample_space = []
@@ -315,4 +358,16 @@ class MinesweeperAI():
                     sample_space.append((i, j))
         if len(sample_space) == 0:
             return None
-        return random.choice(sample_space)
+
+        # chance of a mine in each cell, given every sentence and the number of mines left
+        frontier = set()
+        for sentence in self.knowledge:
+            frontier |= sentence.cells
+        estimate = probabilities(components(self.knowledge), len(sample_space) - len(frontier),
+                                 self.mine_count - len(self.mines), self.cache)
+        if estimate is None:
+            return random.choice(sample_space)
+        risk, other = estimate
+
+        lowest = min(risk.get(cell, other) for cell in sample_space)
+        return random.choice([cell for cell in sample_space if risk.get(cell, other) <= lowest + 1e-9])
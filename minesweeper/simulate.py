@@ -0,0 +1,100 @@
+"""
+Headless Minesweeper simulator
+
+Plays many games of MinesweeperAI against Minesweeper boards, without the
+pygame runner, spread over a process pool. Each game is seeded with its
+number, so a run can be repeated exactly to compare two versions of the AI.
+"""
+
+import random
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# (height, width, mine density): beginner, intermediate and expert boards
+BOARDS = [(8, 8, 8 / 64), (16, 16, 40 / 256), (16, 30, 99 / 480)]
+
+
+def parse_board(text):
+    """Reads a board given as HEIGHTxWIDTH:DENSITY, e.g. 16x30:0.2."""
+    size, density = text.split(":")
+    height, width = size.split("x")
+    return int(height), int(width), float(density)
+
+
+def play(height, width, mines, seed):
+    """
+    Plays one game and returns (won, moves made, seconds spent in the AI,
+    most sentences ever held in the AI's knowledge).
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+
+    moves = 0
+    thinking = 0
+    largest = 0
+    while ai.mines != game.mines:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        thinking += time.perf_counter() - start
+        if move is None or game.is_mine(move):
+            return False, moves, thinking, largest
+
+        moves += 1
+        start = time.perf_counter()
+        ai.add_knowledge(move, game.nearby_mines(move))
+        thinking += time.perf_counter() - start
+        largest = max(largest, len(ai.knowledge))
+    return True, moves, thinking, largest
+
+
+def play_game(task):
+    return play(*task)
+
+
+def simulate(height, width, density, games, executor, seed=0):
+    """
+    Plays `games` games on one kind of board and returns a dict of statistics.
+    """
+    mines = round(height * width * density)
+    tasks = [(height, width, mines, seed + game) for game in range(games)]
+    start = time.perf_counter()
+    results = list(executor.map(play_game, tasks, chunksize=max(1, games // 64)))
+    seconds = time.perf_counter() - start
+
+    moves = sum(result[1] for result in results)
+    thinking = sum(result[2] for result in results)
+    return {
+        "mines": mines,
+        "win rate": sum(result[0] for result in results) / games,
+        "moves/s": moves / seconds,
+        "ms/move": 1000 * thinking / moves if moves else 0,
+        "peak sentences": max(result[3] for result in results),
+    }
+
+
+def main():
+
+    # Check usage
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python simulate.py games [processes] [HEIGHTxWIDTH:DENSITY ...]")
+    games = int(sys.argv[1])
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    boards = [parse_board(text) for text in sys.argv[3:]] or BOARDS
+
+    print(f"{'board':>10} {'mines':>6} {'win rate':>9} {'moves/s':>9} {'ms/move':>8} {'KB size':>8}")
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for height, width, density in boards:
+            stats = simulate(height, width, density, games, executor)
+            print(f"{f'{height}x{width}':>10} {stats['mines']:>6} {stats['win rate']:>9.1%} "
+                  f"{stats['moves/s']:>9.0f} {stats['ms/move']:>8.3f} {stats['peak sentences']:>8}")
+
+
+if __name__ == "__main__":
+    main()
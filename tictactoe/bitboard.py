@@ -0,0 +1,153 @@
+"""
+Tic Tac Toe engine on bitboards
+
+A state is a pair of 9-bit integers (x, o): bit 3 * i + j of x is set when
+X has played cell (i, j), and likewise for o. The functions at the bottom
+adapt the engine to the list-of-lists boards used by tictactoe.py, with
+the same names, so either module can drive the game.
+"""
+
+from tictactoe import X, O, EMPTY
+
+FULL = 0b111111111
+
+# the 8 winning lines, as masks
+LINES = [
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100                # diagonals
+]
+
+# WON[bits] is True when the cells in bits contain a full line
+WON = [any(bits & line == line for line in LINES) for bits in range(1 << 9)]
+
+# CELLS[bits] lists the cells (0 - 8) set in bits
+CELLS = [[k for k in range(9) if bits >> k & 1] for bits in range(1 << 9)]
+
+# transposition table: state -> minimax value of the state
+TABLE = dict()
+
+
+def initial():
+    return (0, 0)
+
+
+def x_to_move(state):
+    x, o = state
+    return x.bit_count() == o.bit_count()
+
+
+def moves(state):
+    x, o = state
+    return CELLS[FULL & ~(x | o)]
+
+
+def play(state, cell):
+    x, o = state
+    if x_to_move(state):
+        return (x | 1 << cell, o)
+    return (x, o | 1 << cell)
+
+
+def winner_of(state):
+    x, o = state
+    if WON[x]:
+        return X
+    if WON[o]:
+        return O
+    return None
+
+
+def over(state):
+    x, o = state
+    return WON[x] or WON[o] or x | o == FULL
+
+
+def score(state):
+    x, o = state
+    return 1 if WON[x] else -1 if WON[o] else 0
+
+
+def solve(state):
+    """Returns the minimax value of state: 1 if X wins, -1 if O wins, 0 for a draw."""
+    if state not in TABLE:
+        if over(state):
+            TABLE[state] = score(state)
+        elif x_to_move(state):
+            TABLE[state] = max(solve(play(state, cell)) for cell in moves(state))
+        else:
+            TABLE[state] = min(solve(play(state, cell)) for cell in moves(state))
+    return TABLE[state]
+
+
+def best(state):
+    """Returns an optimal cell to play in state, or None if the game is over."""
+    if over(state):
+        return None
+    if x_to_move(state):
+        return max(moves(state), key=lambda cell: solve(play(state, cell)))
+    return min(moves(state), key=lambda cell: solve(play(state, cell)))
+
+
+def encode(board):
+    x = o = 0
+    for i in range(3):
+        for j in range(3):
+            if board[i][j] == X:
+                x |= 1 << (3 * i + j)
+            elif board[i][j] == O:
+                o |= 1 << (3 * i + j)
+    return (x, o)
+
+
+def decode(state):
+    x, o = state
+    return [[X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1 else EMPTY
+             for j in range(3)]
+            for i in range(3)]
+
+
+# adapters with the same interface as tictactoe.py
+# (on a finished board, player returns None and actions an empty set)
+
+def initial_state():
+    return decode(initial())
+
+
+def player(board):
+    state = encode(board)
+    if over(state):
+        return None
+    return X if x_to_move(state) else O
+
+
+def actions(board):
+    state = encode(board)
+    if over(state):
+        return set()
+    return {divmod(cell, 3) for cell in moves(state)}
+
+
+def result(board, action):
+    state = encode(board)
+    cell = 3 * action[0] + action[1]
+    if (state[0] | state[1]) >> cell & 1:
+        raise Exception("cell already taken")
+    return decode(play(state, cell))
+
+
+def winner(board):
+    return winner_of(encode(board))
+
+
+def terminal(board):
+    return over(encode(board))
+
+
+def utility(board):
+    return score(encode(board))
+
+
+def minimax(board):
+    cell = best(encode(board))
+    return None if cell is None else divmod(cell, 3)
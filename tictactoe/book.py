@@ -0,0 +1,70 @@
+"""
+Builds the tic-tac-toe opening book read by tictactoe.minimax
+
+Every position reachable from the empty board is solved once by
+retrograde analysis: positions are valued from the fullest boards back to
+the empty one, each from the values of its children. The book is written
+as one byte per base-3 board code (see tictactoe.book_code), holding the
+best cell and the minimax value, so a lookup is a single index.
+"""
+
+import sys
+
+from bitboard import initial, moves, over, play, score, x_to_move
+from tictactoe import BOOK_FILE
+
+
+def state_code(state):
+    # same code as tictactoe.book_code: cell k counts 3^k, 1 for X, 2 for O
+    x, o = state
+    return sum(3 ** k * (1 if x >> k & 1 else 2 if o >> k & 1 else 0)
+               for k in range(9))
+
+
+def solve_all():
+    """
+    Returns a dict mapping every reachable state to (best cell, value),
+    with cell None on finished boards.
+    """
+    # find every reachable state, grouped by number of marks
+    layers = [{initial()}]
+    for _ in range(9):
+        layer = set()
+        for state in layers[-1]:
+            if not over(state):
+                layer.update(play(state, cell) for cell in moves(state))
+        layers.append(layer)
+
+    # value them backwards, from full boards to the empty one
+    solved = dict()
+    for layer in reversed(layers):
+        for state in layer:
+            if over(state):
+                solved[state] = (None, score(state))
+                continue
+            children = [(solved[play(state, cell)][1], cell)
+                        for cell in moves(state)]
+            if x_to_move(state):
+                value, cell = max(children, key=lambda child: child[0])
+            else:
+                value, cell = min(children, key=lambda child: child[0])
+            solved[state] = (cell, value)
+    return solved
+
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) == 2 else BOOK_FILE
+    solved = solve_all()
+
+    # byte = (cell + 1) + 16 * (value + 1), with cell + 1 = 0 for none
+    book = bytearray(3 ** 9)
+    for state, (cell, value) in solved.items():
+        cell = 0 if cell is None else cell + 1
+        book[state_code(state)] = cell + 16 * (value + 1)
+    with open(filename, "wb") as f:
+        f.write(book)
+    print(f"Solved {len(solved)} positions, wrote {filename}")
+
+
+if __name__ == "__main__":
+    main()
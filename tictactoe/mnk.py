@@ -0,0 +1,226 @@
+"""
+m,n,k-game player: tic-tac-toe on a board with `height` rows and `width`
+columns, won by the first player to get `k` in a row.
+
+Boards and actions are the same as in tictactoe.py (lists of rows holding
+X, O or EMPTY, and (i, j) tuples). Exhaustive minimax does not scale past
+3x3, so the AI runs a depth-limited alpha-beta search with a heuristic
+evaluation, deepening iteratively until its time budget runs out.
+"""
+
+import time
+
+from tictactoe import X, O, EMPTY
+
+# value of a won position, well above any heuristic evaluation
+WIN = 10 ** 9
+
+# the four directions a line can run in
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+class OutOfTime(Exception):
+    pass
+
+
+class Game():
+
+    def __init__(self, height=3, width=3, k=3):
+        self.height = height
+        self.width = width
+        self.k = k
+
+        # every run of k cells in a line, which a player must fill to win
+        self.windows = []
+        for i in range(height):
+            for j in range(width):
+                for di, dj in DIRECTIONS:
+                    end_i, end_j = i + (k - 1) * di, j + (k - 1) * dj
+                    if 0 <= end_i < height and 0 <= end_j < width:
+                        self.windows.append(
+                            [(i + s * di, j + s * dj) for s in range(k)]
+                        )
+
+        # search statistics of the last call to minimax
+        self.nodes = 0
+        self.depth = 0
+
+    def initial_state(self):
+        return [[EMPTY] * self.width for _ in range(self.height)]
+
+    def player(self, board):
+        count = sum(row.count(X) - row.count(O) for row in board)
+        return X if count == 0 else O
+
+    def actions(self, board):
+        return {
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if board[i][j] == EMPTY
+        }
+
+    def result(self, board, action):
+        i, j = action
+        if board[i][j] != EMPTY:
+            raise Exception("cell already taken")
+        new_board = [row.copy() for row in board]
+        new_board[i][j] = self.player(board)
+        return new_board
+
+    def wins_at(self, board, action):
+        """Returns True if the mark at `action` completes k in a row."""
+        i, j = action
+        mark = board[i][j]
+        if mark == EMPTY:
+            return False
+
+        # count the run through (i, j) in both senses of each direction
+        for di, dj in DIRECTIONS:
+            run = 1
+            for sense in (1, -1):
+                a, b = i + sense * di, j + sense * dj
+                while (0 <= a < self.height and 0 <= b < self.width
+                       and board[a][b] == mark):
+                    run += 1
+                    a, b = a + sense * di, b + sense * dj
+            if run >= self.k:
+                return True
+        return False
+
+    def winner(self, board):
+        for window in self.windows:
+            i, j = window[0]
+            mark = board[i][j]
+            if mark != EMPTY and all(board[a][b] == mark for a, b in window):
+                return mark
+        return None
+
+    def terminal(self, board):
+        return (self.winner(board) is not None
+                or all(EMPTY not in row for row in board))
+
+    def utility(self, board):
+        winner = self.winner(board)
+        return 1 if winner == X else -1 if winner == O else 0
+
+    def evaluate(self, board, mark):
+        """
+        Heuristic value of board for `mark`: every window that only one
+        player has marks in counts for that player, 10^(marks in it).
+        """
+        score = 0
+        for window in self.windows:
+            mine = theirs = 0
+            for a, b in window:
+                cell = board[a][b]
+                if cell == mark:
+                    mine += 1
+                elif cell != EMPTY:
+                    theirs += 1
+            if mine and not theirs:
+                score += 10 ** mine
+            elif theirs and not mine:
+                score -= 10 ** theirs
+        return score
+
+    def candidates(self, board):
+        """
+        Empty cells worth trying: on large boards only those next to a
+        mark (any cell, on an empty board), centre-most first.
+        """
+        empty = self.actions(board)
+        if self.height * self.width > 16:
+            near = set()
+            for i in range(self.height):
+                for j in range(self.width):
+                    if board[i][j] != EMPTY:
+                        for a in range(i - 1, i + 2):
+                            for b in range(j - 1, j + 2):
+                                near.add((a, b))
+            empty = (empty & near) or empty
+        centre = ((self.height - 1) / 2, (self.width - 1) / 2)
+        return sorted(
+            empty,
+            key=lambda c: (abs(c[0] - centre[0]) + abs(c[1] - centre[1]), c)
+        )
+
+    def minimax(self, board, budget=1.0, max_depth=None):
+        """
+        Returns the best action for the player to move on board, searching
+        one ply deeper at a time until `budget` seconds have passed, the
+        game is decided, or `max_depth` plies are searched.
+        Returns None if the game is over.
+        """
+        if self.terminal(board):
+            return None
+        deadline = time.monotonic() + budget
+        mark = self.player(board)
+        board = [row.copy() for row in board]
+        remaining = sum(row.count(EMPTY) for row in board)
+        if max_depth is None or max_depth > remaining:
+            max_depth = remaining
+
+        self.nodes = 0
+        self.depth = 0
+        order = self.candidates(board)
+        best = order[0]
+        for depth in range(1, max_depth + 1):
+            try:
+                scores = {}
+                alpha = -WIN - 1
+                for action in order:
+                    score = -self.negamax(board, action, mark, depth - 1,
+                                          -WIN - 1, -alpha, deadline)
+                    scores[action] = score
+                    alpha = max(alpha, score)
+            except OutOfTime:
+                break
+
+            # next iteration searches the best moves of this one first
+            order.sort(key=lambda action: -scores[action])
+            best = order[0]
+            self.depth = depth
+            if abs(scores[best]) >= WIN - self.height * self.width:
+                break  # the game is decided
+        return best
+
+    def negamax(self, board, action, mark, depth, alpha, beta, deadline):
+        """
+        Plays `mark` at `action`, and returns the value of the resulting
+        board for the opponent, searched `depth` more plies. The board is
+        restored before returning.
+        """
+        # a leaf's evaluation scans the whole board, so the clock is cheap next to a node
+        self.nodes += 1
+        if time.monotonic() > deadline:
+            raise OutOfTime
+
+        i, j = action
+        board[i][j] = mark
+        try:
+            opponent = O if mark == X else X
+
+            # quicker wins are worth more
+            if self.wins_at(board, action):
+                return -(WIN - self.count_marks(board))
+            order = self.candidates(board)
+            if not order:
+                return 0
+            if depth == 0:
+                return self.evaluate(board, opponent)
+
+            value = -WIN - 1
+            for child in order:
+                value = max(value, -self.negamax(board, child, opponent,
+                                                 depth - 1, -beta, -alpha,
+                                                 deadline))
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+            return value
+        finally:
+            board[i][j] = EMPTY
+
+    def count_marks(self, board):
+        return sum(self.width - row.count(EMPTY) for row in board)
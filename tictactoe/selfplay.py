@@ -0,0 +1,123 @@
+"""
+Headless self-play benchmark for the Tic Tac Toe AI
+
+Plays games of AI against AI and of AI (as X and as O) against a random
+player, without the pygame runner, and reports games per second, nodes
+searched per move and peak memory. Each matchup is played cold, with the
+search tables emptied before every game, and warm, with the tables kept
+from game to game. Exits with an error if the AI ever loses, so it
+doubles as a correctness check.
+"""
+
+import random
+import resource
+import sys
+import time
+
+import tictactoe as ttt
+
+
+def alphabeta_move(board, stats):
+    return ttt.alphabeta(board, stats)
+
+
+def minimax_move(board, stats):
+    return ttt.minimax(board, stats)
+
+
+def search_move(board, stats):
+    # minimax without the opening book: every position valued by the memoised search
+    return ttt.minimax(board, stats, use_book=False)
+
+
+# engine name -> function(board, stats) returning the AI's move, counting positions visited in stats["nodes"]
+ENGINES = {
+    "minimax": minimax_move,
+    "search": search_move,
+    "alphabeta": alphabeta_move,
+}
+
+
+# most games played with the search tables emptied before each one
+COLD_GAMES = 100
+
+
+def clear_tables():
+    # forget every position searched so far, so the next search starts cold
+    ttt.TABLE.clear()
+    ttt.BOUNDS.clear()
+    ttt.KILLERS.clear()
+
+
+def play(engine, x_is_ai, o_is_ai, rng, stats):
+    """
+    Plays one game and returns its winner (None for a draw).
+    Adds the number of AI moves to stats["moves"].
+    """
+    board = ttt.initial_state()
+    while not ttt.terminal(board):
+        if (ttt.player(board) == ttt.X and x_is_ai) or (ttt.player(board) == ttt.O and o_is_ai):
+            action = engine(board, stats)
+            stats["moves"] += 1
+        else:
+            action = rng.choice(sorted(ttt.actions(board)))
+        board = ttt.result(board, action)
+    return ttt.winner(board)
+
+
+def main():
+
+    # Check usage
+    if len(sys.argv) > 4 or (len(sys.argv) > 2 and sys.argv[2] not in ENGINES):
+        sys.exit(f"Usage: python selfplay.py [games] [{'|'.join(ENGINES)}] [seed]")
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    if games < 1:
+        sys.exit("games must be at least 1")
+    name = sys.argv[2] if len(sys.argv) > 2 else "minimax"
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    engine = ENGINES[name]
+    rng = random.Random(seed)
+
+    # (description, X is the AI, O is the AI, the side that must never win)
+    matchups = [
+        ("AI vs AI", True, True, None),
+        ("AI (X) vs random", True, False, ttt.O),
+        ("random vs AI (O)", False, True, ttt.X),
+    ]
+    losses = 0
+    for description, x_is_ai, o_is_ai, loser in matchups:
+        results = {ttt.X: 0, ttt.O: 0, None: 0}
+        lines = []
+        # a cold game searches the whole tree, so fewer of them are played
+        for warm, count in ((False, min(games, COLD_GAMES)), (True, games)):
+            clear_tables()
+            stats = {"moves": 0, "nodes": 0}
+            start = time.perf_counter()
+            for _ in range(count):
+                if not warm:
+                    clear_tables()
+                winner = play(engine, x_is_ai, o_is_ai, rng, stats)
+                results[winner] += 1
+            seconds = time.perf_counter() - start
+            lines.append(f"    {'warm' if warm else 'cold'}: {count / seconds:.0f} games/s, "
+                         f"{stats['moves'] / seconds:.0f} moves/s, {stats['nodes'] / stats['moves']:.1f} nodes/move")
+
+        print(f"{description}: X {results[ttt.X]}, O {results[ttt.O]}, draws {results[None]}")
+        for line in lines:
+            print(line)
+
+        # AI vs AI must always draw, and the AI must never lose to random
+        if loser is None:
+            losses += results[ttt.X] + results[ttt.O]
+        else:
+            losses += results[loser]
+
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"Peak memory: {peak / 1024:.1f} MB")
+    if losses:
+        sys.exit(f"AI lost {losses} games")
+
+
+if __name__ == "__main__":
+    main()
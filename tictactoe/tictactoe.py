@@ -4,6 +4,7 @@ Tic Tac Toe Player
 
 import math
 import copy
+import os
 
 X = "X"
 O = "O"
@@ -93,43 +94,194 @@ def utility(board):
         return 0
 
 
-def minimax(board):
+def symmetries():
+
+    # built in a function so its loop variables do not become module globals
+    found = []
+    for transform in [lambda i, j: (i, j), lambda i, j: (j, 2 - i), lambda i, j: (2 - i, 2 - j), lambda i, j: (2 - j, i)]:
+        for reflect in [False, True]:
+            symmetry = [None] * 9
+            for i in range(3):
+                for j in range(3):
+                    a, b = transform(i, 2 - j if reflect else j)
+                    symmetry[3 * a + b] = (i, j)
+            found.append(symmetry)
+    return found
+
+
+# the 8 rotations and reflections of the board, each as a list where entry k is the cell (of the original board) that goes to cell k
+SYMMETRIES = symmetries()
+
+# transposition table: canonical board -> minimax value of the board (1 if X wins with best play, -1 if O wins, 0 for a draw)
+TABLE = dict()
+
+
+def canonical(board):
+
+    # boards equal up to rotation/reflection have the same value, so key them all by the smallest of their 8 encodings
+    return orient(board)[0]
+
+
+def orient(board):
+
+    # (canonical encoding of board, symmetry that gives it). Cell k of the canonical board is cell symmetry[k] of board.
+    codes = {X: "x", O: "o", EMPTY: "-"}
+    return min(
+        ("".join(codes[board[i][j]] for i, j in symmetry), symmetry)
+        for symmetry in SYMMETRIES
+    )
+
+
+def value(board, stats=None):
+
+    # minimax value of board, each position (up to symmetry) searched only once. stats, if given, is a dict whose "nodes" entry counts positions visited.
+    if stats is not None:
+        stats["nodes"] = stats.get("nodes", 0) + 1
+    key = canonical(board)
+    if key not in TABLE:
+        if terminal(board):
+            TABLE[key] = utility(board)
+        elif player(board) == X:
+            TABLE[key] = max(value(result(board, action), stats) for action in actions(board))
+        else:
+            TABLE[key] = min(value(result(board, action), stats) for action in actions(board))
+    return TABLE[key]
+
+
+# opening book written by book.py: one byte per position, see book_code
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+BOOK = None
+
+
+def book_code(board):
+
+    # base-3 code of board: cell (i, j) counts 3^(3i + j), times 1 for X or 2 for O
+    codes = {EMPTY: 0, X: 1, O: 2}
+    return sum(3 ** (3 * i + j) * codes[board[i][j]] for i in range(3) for j in range(3))
+
+
+def load_book(filename=BOOK_FILE):
+
+    # read the opening book once; without one (b""), or with a truncated or stale one, minimax searches instead
+    global BOOK
+    if BOOK is None:
+        try:
+            with open(filename, "rb") as f:
+                BOOK = f.read()
+        except OSError:
+            BOOK = b""
+        if len(BOOK) != 3 ** 9:
+            BOOK = b""
+    return BOOK
+
+
+def minimax(board, stats=None, use_book=True):
 
     if terminal(board):
         return None
+    # answer straight from the opening book if there is one (and use_book): low 4 bits are best cell + 1 (0 for none). a lookup counts as one node in stats.
+    book = load_book() if use_book else b""
+    if book:
+        if stats is not None:
+            stats["nodes"] = stats.get("nodes", 0) + 1
+        cell = book[book_code(board)] & 15
+        if cell:
+            return divmod(cell - 1, 3)
+    # value of each action computed once (not once to find the best value and again to find its action)
+    values = {action: value(result(board, action), stats) for action in actions(board)}
     if player(board) == X:
-        u = -2
-        for action in actions(board):
-            u = max(u, min_val(result(board, action)))
-        for action in actions(board):
-            if min_val(result(board, action)) == u:
-                return action
-    if player(board) == O:
-        u = 2
-        for action in actions(board):
-            u = min(u, max_val(result(board, action)))
-        for action in actions(board):
-            if max_val(result(board, action)) == u:
-                return action
+        return max(values, key=values.get)
+    else:
+        return min(values, key=values.get)
 
 
 def max_val(board):
 
-    # find max over stuff X could play
-    if terminal(board):
-        return utility(board)
-    u = -2
-    for action in actions(board):
-        u = max(u, min_val(result(board, action)))
-    return u
+    # find max over stuff X could play. board has X to play, so its value is exactly that.
+    return value(board)
 
 
 def min_val(board):
 
     # find min over stuff O can play
+    return value(board)
+
+
+# alpha-beta tries the centre first, then corners, then edges
+ORDER = [(1, 1), (0, 0), (0, 2), (2, 0), (2, 2), (0, 1), (1, 0), (1, 2), (2, 1)]
+
+# killer moves: canonical board -> index (in canonical cells) of the best move found there last time, tried before ORDER
+KILLERS = dict()
+
+# alpha-beta bounds: canonical board -> (lower bound, upper bound, index in canonical cells of the move proving the bound on the
+# mover's side, or None). a search that fails high or low still narrows the value, so nothing searched is thrown away.
+BOUNDS = dict()
+
+
+def alphabeta(board, stats=None):
+
+    # same optimal move as minimax, with alpha-beta pruning. stats, if given, is a dict whose "nodes" entry counts positions visited.
+    if stats is None:
+        stats = dict()
+    stats.setdefault("nodes", 0)
+    if terminal(board):
+        return None
+    return alphabeta_search(board, -2, 2, stats)[0]
+
+
+def alphabeta_search(board, alpha, beta, stats):
+
+    # (best action, value) of board, where value is exact if alpha < value < beta, else only a bound beyond that side of the window
+    stats["nodes"] += 1
     if terminal(board):
-        return utility(board)
-    u = 2
-    for action in actions(board):
-        u = min(u, max_val(result(board, action)))
-    return u
+        return None, utility(board)
+    key, symmetry = orient(board)
+    maximizing = player(board) == X
+
+    # values are between -1 and 1, so with no entry those are the bounds
+    lower, upper, index = BOUNDS.get(key, (-1, 1, None))
+    if lower >= beta or upper <= alpha or lower == upper:
+        if index is not None:
+            action = symmetry[index]
+        else:
+            # no move proved the mover's bound, so every move ends at that bound (or it is never used)
+            action = next(action for action in ORDER if board[action[0]][action[1]] == EMPTY)
+        if lower >= beta or lower == upper:
+            return action, lower
+        return action, upper
+    alpha, beta = max(alpha, lower), min(beta, upper)
+
+    # killer move first, then centre, corners, edges
+    order = [action for action in ORDER if board[action[0]][action[1]] == EMPTY]
+    if key in KILLERS:
+        killer = symmetry[KILLERS[key]]
+        order.remove(killer)
+        order.insert(0, killer)
+
+    low, high = alpha, beta
+    best_action, u = None, (-2 if maximizing else 2)
+    for action in order:
+        child = alphabeta_search(result(board, action), alpha, beta, stats)[1]
+        if maximizing and child > u:
+            best_action, u = action, child
+            alpha = max(alpha, u)
+        elif not maximizing and child < u:
+            best_action, u = action, child
+            beta = min(beta, u)
+        if alpha >= beta:
+            break  # the other side will never let the game reach this board
+
+    # u is a lower bound if it failed high, an upper bound if it failed low, else exact.
+    # best_action proves the bound on the mover's side: a lower bound for X, an upper bound for O.
+    best = symmetry.index(best_action)
+    KILLERS[key] = best
+    if u > low and u > lower:
+        lower = u
+        if maximizing:
+            index = best
+    if u < high and u < upper:
+        upper = u
+        if not maximizing:
+            index = best
+    BOUNDS[key] = (lower, upper, index)
+    return best_action, u
\ No newline at end of file